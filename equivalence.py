@@ -3,10 +3,14 @@
 import sys, os
 from ota import buildOTA, buildAssistantOTA, Timedword, ResetTimedword, State
 #from ota import Timedword, ResetTimedword, State
-from interval import Constraint
+from interval import Constraint, INFCODE
 from otatable import Element
+import zone
+from fractions import Fraction
 #from hypothesis import *
 import copy
+from bisect import bisect_left, bisect_right
+from collections import deque
 #from queue import Queue
 
 def get_regions(max_time_value):
@@ -30,6 +34,227 @@ def get_regions(max_time_value):
                 regions.append(r)
     return regions
 
+class Regions(object):
+    """
+        The regions of get_regions numbered from 0 to 2M+1, for the max time value M:
+        2i for [i,i], 2i+1 for (i,i+1) when i < M and 2M+1 for (M,+).
+        "last" for the last region (M,+);
+        "next" for the next region of each region (the last region is its own next);
+        "ispoint" for indicating whether each region is a point;
+        "min_code" and "max_code" for the codes of the ends of each region;
+        "constraints" for each region as a Constraint.
+    """
+    def __init__(self, max_time_value):
+        self.max_time_value = max_time_value
+        self.constraints = get_regions(max_time_value)
+        self.last = len(self.constraints) - 1
+        self.next = [r+1 for r in range(self.last)] + [self.last]
+        self.ispoint = [r % 2 == 0 for r in range(self.last+1)]
+        self.min_code = [c.min_code for c in self.constraints]
+        self.max_code = [c.max_code for c in self.constraints]
+
+    def region(self, constraint):
+        """The number of the region given as a Constraint.
+        """
+        return bisect_left(self.min_code, constraint.min_code)
+
+    def guard_range(self, constraint):
+        """The first and the last regions which are subsets of the guard constraint.
+           The first one is greater than the last one if there is no such region.
+        """
+        first = bisect_left(self.min_code, constraint.min_code)
+        last = bisect_right(self.max_code, constraint.max_code) - 1
+        return first, last
+
+def region_trans(ota, regions):
+    """Index the transitions of ota by (source, action) for the regions: the lists of
+       (first region, last region, target, reset) of the guards, in the order of ota.trans.
+    """
+    names = set([l.name for l in ota.locations])
+    table = {}
+    for tran in ota.trans:
+        if tran.target not in names:
+            continue
+        first, last = regions.guard_range(tran.constraints[0])
+        table.setdefault((tran.source, tran.label), []).append((first, last, tran.target, tran.reset))
+    return table
+
+class SuccessorTable(object):
+    """
+        The successors of the letters of an OTA, see immediate_letter_asucc and next_region.
+        A letter is packed as (flag, location name, region number), see Product.
+        The regions of a letter stop at the last region of its location.
+        "regions" for the Regions of the letters;
+        "trans" for the transitions indexed by region_trans;
+        "succ" for the successors computed so far: (letter, action) -> letter or None;
+        "moves" for the actions enabled in the letters computed so far: letter -> [(action, letter)];
+        "delay" for the delay successors computed so far: letter -> letter;
+        "live" for the names of the locations which can reach acceptance, see live_locations;
+        "last" for the last region of each location, see location_max_constants, or the last
+        region of regions for all of them if not extrapolate;
+        "reachable" for the letters reached from the initial letter, once explored.
+    A table can take the successors of the unchanged locations from the table of a
+    previous version of the OTA, see reuse.
+    """
+    def __init__(self, ota, regions, extrapolate=True):
+        self.regions = regions
+        self.flag = ota.locations[0].flag
+        self.initstate_name = ota.initstate_name
+        self.sigma = ota.sigma
+        self.trans = region_trans(ota, regions)
+        self.tran_number = len(ota.trans)
+        self.succ = {}
+        self.moves = {}
+        self.delay = {}
+        self.live = live_locations(ota)
+        self.last = {}
+        for name, constant in location_max_constants(ota).items():
+            if extrapolate == True:
+                self.last[name] = 2*min(constant, regions.max_time_value) + 1
+            else:
+                self.last[name] = regions.last
+        self.reachable = None
+
+    def letter_asucc(self, letter, action):
+        try:
+            return self.succ[(letter, action)]
+        except KeyError:
+            pass
+        flag, name, region = letter
+        result = None
+        for first, last, target, reset in self.trans.get((name, action), []):
+            if first <= region <= last:
+                if reset == True:
+                    region = 0
+                # the max constant of the target is at most the one of the source if the clock is not reset
+                region = min(region, self.last.get(target, self.regions.last))
+                result = (flag, target, region)
+                break
+        self.succ[(letter, action)] = result
+        return result
+
+    def reuse(self, table, changed):
+        """Take the successors computed in table, of a previous version of the OTA, of the
+           letters of the locations not in changed, if the last regions of the locations
+           of the letter and of the successor are the same in both.
+        """
+        last = self.last
+        for (letter, action), next in table.succ.items():
+            name = letter[1]
+            if name in changed or last.get(name) != table.last.get(name):
+                continue
+            if next is not None and last.get(next[1]) != table.last.get(next[1]):
+                continue
+            self.succ[(letter, action)] = next
+        for letter, next in table.delay.items():
+            name = letter[1]
+            if name not in changed and last.get(name) == table.last.get(name):
+                self.delay[letter] = next
+
+    def letter_moves(self, letter):
+        """The list of (action, successor) of the actions enabled in letter, in the order of sigma.
+        """
+        try:
+            return self.moves[letter]
+        except KeyError:
+            pass
+        result = []
+        for action in self.sigma:
+            next = self.letter_asucc(letter, action)
+            if next is not None:
+                result.append((action, next))
+        self.moves[letter] = result
+        return result
+
+    def letter_delay(self, letter):
+        """The next letter of letter by a delay, letter itself in the last region of its location.
+        """
+        try:
+            return self.delay[letter]
+        except KeyError:
+            pass
+        flag, name, region = letter
+        if region < self.last.get(name, self.regions.last):
+            result = (flag, name, self.regions.next[region])
+        else:
+            result = letter
+        self.delay[letter] = result
+        return result
+
+    def explore(self):
+        """Compute the delay successors and the enabled actions of all the letters reached
+           from the initial letter, once. For the teacher during learning, the table is kept
+           (see successor_table), so every equivalence query reuses them.
+        """
+        if self.reachable is not None:
+            return
+        init = (self.flag, self.initstate_name, 0)
+        reachable = set([init])
+        stack = [init]
+        while len(stack) > 0:
+            letter = stack.pop()
+            nexts = [self.letter_delay(letter)] + [next for action, next in self.letter_moves(letter)]
+            for next in nexts:
+                if next not in reachable:
+                    reachable.add(next)
+                    stack.append(next)
+        self.reachable = reachable
+
+def live_locations(ota):
+    """Return the set of the names of the locations of ota from which an accepting location
+       can be reached, ignoring the guards. The other ones, like the sink, never accept again.
+    """
+    preds = {}
+    for tran in ota.trans:
+        preds.setdefault(tran.target, set()).add(tran.source)
+    live = set(ota.accept_names)
+    stack = list(live)
+    while len(stack) > 0:
+        name = stack.pop()
+        for pre in preds.get(name, []):
+            if pre not in live:
+                live.add(pre)
+                stack.append(pre)
+    return live
+
+def location_max_constants(ota):
+    """Return the max constant of each location of ota: the greatest constant in the guards
+       of the transitions from it, or from the locations reached from it without a reset.
+       Beyond it, the values of the clock in the location can not be told apart any more.
+    """
+    constants = dict((l.name, 0) for l in ota.locations)
+    for tran in ota.trans:
+        c = tran.constraints[0]
+        constant = c.min_code >> 2
+        if c.max_code != INFCODE:
+            constant = max(constant, c.max_code >> 2)
+        if constant > constants.get(tran.source, 0):
+            constants[tran.source] = constant
+    changed = True
+    while changed == True:
+        changed = False
+        for tran in ota.trans:
+            if tran.reset == False and constants.get(tran.target, 0) > constants.get(tran.source, 0):
+                constants[tran.source] = constants[tran.target]
+                changed = True
+    return constants
+
+def successor_table(ota, regions):
+    """Return the SuccessorTable of ota for the max time value of regions. It is kept as
+       ota.succ_table, so that it is built once for an OTA whose transitions do not change,
+       as the teacher during learning. A new table reuses ota.base_table, as a hypothesis
+       reuses the table of the previous one.
+    """
+    table = ota.succ_table
+    if table is None or table.regions.max_time_value != regions.max_time_value or table.tran_number != len(ota.trans):
+        table = SuccessorTable(ota, regions)
+        base = ota.base_table
+        if base is not None and base.regions.max_time_value == regions.max_time_value:
+            table.reuse(base, ota.changed)
+        ota.base_table = None
+        ota.succ_table = table
+    return table
+
 def minnum_in_region(constraint):
     """Return the minimal number in the region. For [5,9], return 5; for (4,10), return 4.1 .
     """
@@ -57,21 +282,23 @@ class Letter(object):
         The definition of letter. A letter is a pair (location, region).
         "location" for indicating the location
         "constraint" for the region
+        "key" for the packed letter (flag, location name, min_code, max_code)
     """
     def __init__(self, location, constraint):
         self.location = location
         if isinstance(constraint, str):
             constraint = Constraint(constraint)
         self.constraint = constraint
+        self.key = (location.flag, location.name, constraint.min_code, constraint.max_code)
     
     def __eq__(self, letter):
-        if self.location == letter.location and self.constraint == letter.constraint:
+        if self.key == letter.key:
             return True
         else:
             return False
             
     def __hash__(self):
-        return hash(("LETTER", self.location, self.constraint))
+        return hash(self.key)
     
     def to_state(self, i):
         """
@@ -103,16 +330,25 @@ class Letterword(object):
         self.lw = lw or []
         self.prelw = prelw
         self.action = action
+        self._key = None
+
+    def key(self):
+        """The canonical key of the letterword: the tuple of the frozensets of its packed letters.
+           It is computed once, so "lw" should not be changed afterwards.
+        """
+        if self._key is None:
+            self._key = tuple(frozenset(letter.key for letter in letters) for letters in self.lw)
+        return self._key
 
     def __eq__(self, letterword):
         #if self.lw == letterword.lw and self.prelw == letterword.prelw and self.action==letterword.action:
-        if self.lw == letterword.lw:
+        if self.key() == letterword.key():
             return True
         else:
             return False
             
     def __hash__(self):
-        return hash(("LETTERWORD", self.lw, self.prelw, self.action))
+        return hash(self.key())
     
     def show(self):
         return self.lw #, self.action
@@ -154,22 +390,81 @@ def letterword_dominated(lw1, lw2):
     """
         To determin whether letterword lw1 is dominated by letterword lw2 (lw1 <= lw2)
     """
+    return key_dominated(lw1.key(), lw2.key())
+
+def key_dominated(key1, key2):
+    """
+        To determin whether the letterword of key key1 is dominated by the letterword of key key2:
+        the letter sets of key1 are subsets of letter sets of key2 in the same order.
+    """
     index = 0
-    flag = 0
-    for letters1 in lw1.lw:
-        for i in range(index, len(lw2.lw)):
-            if letters1.issubset(lw2.lw[i]):
+    for letters1 in key1:
+        for i in range(index, len(key2)):
+            if letters1 <= key2[i]:
                 index = i+1
-                flag = flag + 1
                 break
-            else:
-                pass
-    #print(flag)
-    if flag == len(lw1.lw):
-        return True
-    else:
+        else:
+            return False
+    return True
+
+def bucket_key(key):
+    """The bucket of a letterword key in an Antichain: its locations and the sizes of its letter sets.
+    """
+    locations = sorted((letter[0], letter[1]) for letters in key for letter in letters)
+    return tuple(locations), tuple(len(letters) for letters in key)
+
+class InclusionStats(object):
+    """
+        The counters of the inclusion checks.
+        "explored" for the letterwords added to the antichains;
+        "pruned" for the letterwords found dominated by an explored one;
+        "evicted" for the explored letterwords removed as dominated by a new one;
+        "dead" for the letterwords not explored as no bad letterword can be reached from them.
+    """
+    def __init__(self):
+        self.explored = 0
+        self.pruned = 0
+        self.evicted = 0
+        self.dead = 0
+
+class Antichain(object):
+    """
+        The explored letterwords of an inclusion check, keeping only the minimal ones w.r.t. domination.
+        A letterword is only compared with the letterwords in the same bucket (see bucket_key).
+        As a letterword of ota_inclusion has one letter of A and one letter of B, it can only be
+        dominated by a letterword with the same letters, so no domination is missed.
+        "stats" for the InclusionStats to count in;
+        "bucket" and "dominated" for the functions replacing bucket_key and key_dominated,
+        for other keys than letterwords.
+    """
+    def __init__(self, stats=None, bucket=bucket_key, dominated=key_dominated):
+        self.buckets = {}
+        if stats is None:
+            stats = InclusionStats()
+        self.stats = stats
+        self.bucket = bucket
+        self.key_dominated = dominated
+
+    def dominated(self, key):
+        """Whether the letterword of key is dominated by an explored letterword.
+        """
+        for v in self.buckets.get(self.bucket(key), []):
+            if self.key_dominated(v, key):
+                self.stats.pruned = self.stats.pruned + 1
+                return True
         return False
 
+    def add(self, key):
+        """Add the letterword of key and evict the explored letterwords dominated by it.
+        """
+        bkey = self.bucket(key)
+        bucket = self.buckets.get(bkey, [])
+        kept = [v for v in bucket if not self.key_dominated(key, v)]
+        self.stats.evicted = self.stats.evicted + len(bucket) - len(kept)
+        kept.append(key)
+        self.buckets[bkey] = kept
+        self.stats.explored = self.stats.explored + 1
+
 def immediate_letter_asucc(letter, action, ota):
     """
     """
@@ -293,54 +588,18 @@ def next_region(region, max_time_value):
 
 def compute_wsucc(letterword, max_time_value, A, B):
     """Compute the Succ of letterword.
+       Return the delay successors and the immediate 'a' successors of the delay successors.
     """
-    # First compute all possible time delay
-    results = []
-    last_region = Constraint('(' + str(max_time_value) + ',' + '+' + ')')
-    if len(letterword.lw) == 1:
-        result = letterword.lw[0]
-        while any(letter.constraint != last_region for letter in result):
-            results.append(Letterword([result], letterword))
-            new_result = set()
-            for letter in result:
-                new_letter = Letter(letter.location, next_region(letter.constraint, max_time_value))
-                new_result.add(new_letter)
-            result = new_result
-        current_lw = Letterword([result], letterword)
-        if current_lw not in results:
-            results.append(current_lw)
-    elif len(letterword.lw) == 2:
-        if len(letterword.lw[0]) != 1 and len(letterword.lw[1]) != 1:
-            raise NotImplementedError()
-        result = letterword.lw
-        while list(result[0])[0].constraint != last_region or list(result[1])[0].constraint != last_region:
-            results.append(Letterword(result, letterword))
-            new_result = []
-            l1, l2 = list(result[0])[0], list(result[1])[0]
-            if l1.constraint.isPoint():
-                new_result.append({Letter(l1.location, next_region(l1.constraint, max_time_value))})
-                new_result.append({l2})
-            else:
-                new_result.append({Letter(l2.location, next_region(l2.constraint, max_time_value))})
-                new_result.append({l1})
-            result = new_result
-        current_lw = Letterword(result, letterword)
-        if current_lw not in results:
-            results.append(current_lw)
-            new_result = Letterword([current_lw.lw[1], current_lw.lw[0]], letterword)
-            if new_result not in results:
-                results.append(new_result)
-    else:
-        raise NotImplementedError()
-
-    # Next, perform the immediate 'a' transition
-    next = []
-    for letterword in results:
-        next_ws = immediate_asucc(letterword, A, B)
-        for next_w in next_ws:
-            if next_w not in next:
-                next.append(next_w)
-    return results, next
+    product = Product(max_time_value, A, B, False)
+    for letters in letterword.lw:
+        for l in letters:
+            product.locations[l.location.flag].setdefault(l.location.name, l.location)
+            product.last.setdefault((l.location.flag, l.location.name), product.regions.last)
+    results, next = product.wsucc(product.pack(letterword))
+    delays = {}
+    for d in results:
+        delays[d] = product.to_letterword(d, letterword, "DELAY")
+    return [delays[d] for d in results], [product.to_letterword(w, delays[d], action) for w, d, action in next]
 
 def is_bad_letterword(letterword, A, B):
     """Determin whether a letterword is bad.
@@ -375,37 +634,547 @@ def explored_dominated(explored, w):
             return True
     return False
 
-def ota_inclusion(max_time_value, A, B):
+class Product(object):
+    """
+        The letterwords of A and B explored by ota_inclusion and ota_equivalence, packed as in Letterword.key but
+        with the regions numbered as in Regions: the tuples of the frozensets of the packed
+        letters (flag, location name, region number).
+        "regions" for the Regions of the max time value;
+        "A_flag" and "B_flag" for the flags of the locations of A and B;
+        "A_succ" and "B_succ" for the SuccessorTables of A and B, the one of B explored once
+        for all its reachable letters, as B is the teacher in equivalence_query;
+        "extrapolate" for indicating whether the regions of a letter stop at the max constant of
+        its location (see location_max_constants) instead of the max time value;
+        "last" for the last region of the letters of each (flag, location name);
+        "reached" for the letterwords reached by explore, see Reached.
+    """
+    def __init__(self, max_time_value, A, B, extrapolate=True):
+        self.A = A
+        self.B = B
+        self.regions = Regions(max_time_value)
+        self.A_flag = A.locations[0].flag
+        self.B_flag = B.locations[0].flag
+        if extrapolate == True:
+            self.A_succ = successor_table(A, self.regions)
+            self.B_succ = successor_table(B, self.regions)
+            self.B_succ.explore()
+        else:
+            self.A_succ = SuccessorTable(A, self.regions, False)
+            self.B_succ = SuccessorTable(B, self.regions, False)
+        self.extrapolate = extrapolate
+        self.last = {}
+        for flag, succ in ((self.A_flag, self.A_succ), (self.B_flag, self.B_succ)):
+            for name, last in succ.last.items():
+                self.last[(flag, name)] = last
+        self.A_accepts = set(A.accept_names)
+        self.B_accepts = set(B.accept_names)
+        self.reached = None
+        self.locations = {self.A_flag: {}, self.B_flag: {}}
+        for l in A.locations:
+            self.locations[self.A_flag][l.name] = l
+        for l in B.locations:
+            self.locations[self.B_flag][l.name] = l
+
+    def init_key(self):
+        return (frozenset([(self.A_flag, self.A.initstate_name, 0), (self.B_flag, self.B.initstate_name, 0)]),)
+
+    def pack(self, letterword):
+        return tuple(frozenset((l.location.flag, l.location.name, self.regions.region(l.constraint)) for l in letters) for letters in letterword.lw)
+
+    def to_letterword(self, key, prelw=None, action="DELAY"):
+        lw = [set([Letter(self.locations[flag][name], self.regions.constraints[r]) for flag, name, r in letters]) for letters in key]
+        return Letterword(lw, prelw, action)
+
+    def split(self, key):
+        """Return the letter of A, the letter of B, and whether the letter of A is in the first set.
+        """
+        if len(key) == 1:
+            letter1, letter2 = key[0]
+        elif len(key) == 2:
+            letter1, = key[0]
+            letter2, = key[1]
+        else:
+            raise NotImplementedError()
+        if letter1[0] == self.A_flag:
+            return letter1, letter2, True
+        else:
+            return letter2, letter1, False
+
+    def is_bad(self, key):
+        """Whether the letterword of key is bad, in case of L(B) is a subset of L(A).
+        """
+        A_letter, B_letter, _ = self.split(key)
+        return B_letter[1] in self.B_accepts and A_letter[1] not in self.A_accepts
+
+    def is_different(self, key):
+        """Whether exactly one of the letters of key is in an accepting location.
+        """
+        A_letter, B_letter, _ = self.split(key)
+        return (B_letter[1] in self.B_accepts) != (A_letter[1] in self.A_accepts)
+
+    def cannot_be_bad(self, key):
+        """Whether no bad letterword can be reached from key: the letter of B
+           can not reach acceptance.
+        """
+        A_letter, B_letter, _ = self.split(key)
+        return B_letter[1] not in self.B_succ.live
+
+    def cannot_differ(self, key):
+        """Whether no letterword for which is_different holds can be reached from key:
+           none of the letters can reach acceptance.
+        """
+        A_letter, B_letter, _ = self.split(key)
+        return A_letter[1] not in self.A_succ.live and B_letter[1] not in self.B_succ.live
+
+    def delay_succ(self, key):
+        """The delay successors of key, see compute_wsucc.
+        """
+        delay = {self.A_flag: self.A_succ.letter_delay, self.B_flag: self.B_succ.letter_delay}
+        ispoint = self.regions.ispoint
+        results = []
+        if len(key) == 1:
+            letters = key[0]
+            while True:
+                results.append((letters,))
+                nexts = frozenset([delay[l[0]](l) for l in letters])
+                if nexts == letters:
+                    break
+                letters = nexts
+        elif len(key) == 2:
+            l1, = key[0]
+            l2, = key[1]
+            while True:
+                results.append((frozenset([l1]), frozenset([l2])))
+                n1 = delay[l1[0]](l1)
+                n2 = delay[l2[0]](l2)
+                if n1 == l1 and n2 == l2:
+                    break
+                if ispoint[l1[2]]:
+                    l1 = n1
+                elif n2 == l2:
+                    l1, l2 = l2, l1
+                else:
+                    l1, l2 = n2, l1
+            # both letters are in the last region, unlike all the letterwords before
+            results.append((frozenset([l2]), frozenset([l1])))
+        else:
+            raise NotImplementedError()
+        return results
+
+    def cap(self, letter):
+        """The letter with its region stopped at the last region of its location.
+        """
+        flag, name, r = letter
+        last = self.last[flag, name]
+        if r > last:
+            return (flag, name, last)
+        return letter
+
+    def combine(self, A_next, B_next, one, A_first):
+        """The letterword of the successors A_next and B_next of the letters of a letterword
+           with one set of letters if one, whose letter of A is in the first set if A_first.
+        """
+        ispoint = self.regions.ispoint
+        A_ispoint = ispoint[A_next[2]]
+        B_ispoint = ispoint[B_next[2]]
+        if A_ispoint == True and B_ispoint == True:
+            return (frozenset([A_next, B_next]),)
+        elif A_ispoint == True and B_ispoint == False:
+            return (frozenset([A_next]), frozenset([B_next]))
+        elif A_ispoint == False and B_ispoint == True:
+            return (frozenset([B_next]), frozenset([A_next]))
+        elif one == True:
+            return (frozenset([A_next, B_next]),)
+        elif A_first == True:
+            return (frozenset([A_next]), frozenset([B_next]))
+        else:
+            return (frozenset([B_next]), frozenset([A_next]))
+
+    def asucc(self, key, action):
+        """The immediate 'action' successor of key, or None, see immediate_asucc.
+        """
+        A_letter, B_letter, A_first = self.split(key)
+        B_next = self.B_succ.letter_asucc(B_letter, action)
+        A_next = self.A_succ.letter_asucc(A_letter, action)
+        if B_next is None or A_next is None:
+            return None
+        return self.combine(A_next, B_next, len(key) == 1, A_first)
+
+    def action_succ(self, key):
+        """The immediate 'a' successors of key as a list of (key, action), see immediate_asucc.
+        """
+        A_letter, B_letter, A_first = self.split(key)
+        one = len(key) == 1
+        A_asucc = self.A_succ.letter_asucc
+        results = []
+        keys = set()
+        for action, B_next in self.B_succ.letter_moves(B_letter):
+            A_next = A_asucc(A_letter, action)
+            if A_next is None:
+                continue
+            w = self.combine(A_next, B_next, one, A_first)
+            if w not in keys:
+                keys.add(w)
+                results.append((w, action))
+        return results
+
+    def wsucc(self, key):
+        """Compute the Succ of key, see compute_wsucc. The immediate 'a' successors
+           are given as (key, delay successor, action).
+        """
+        results = self.delay_succ(key)
+        next = []
+        keys = set()
+        for d in results:
+            for w, action in self.action_succ(d):
+                if w not in keys:
+                    keys.add(w)
+                    next.append((w, d, action))
+        return results, next
+
+    def successors(self, key):
+        """The immediate 'a' successors of key as (key, (delay successor, action)), see wsucc.
+        """
+        results, next = self.wsucc(key)
+        return [(w, (d, action)) for w, d, action in next]
+
+    def new_antichain(self, stats=None):
+        return Antichain(stats)
+
+    def path_to_letterword(self, key):
+        """Rebuild the letterword of key with its predecessors from the parents
+           recorded by explore, see Reached.path.
+        """
+        steps = [(w, d, action) for w, (d, action) in self.reached.path(key)]
+        if self.extrapolate == True:
+            steps = self.unextrapolate(steps)
+        letterword = self.to_letterword(self.reached.keys[0], None, '')
+        for w, d, action in steps:
+            letterword = self.to_letterword(d, letterword, "DELAY")
+            letterword = self.to_letterword(w, letterword, action)
+        return letterword
+
+    def same(self, exact_key, key):
+        """Whether the letterword exact_key of a Product without extrapolation is the letterword
+           key after extrapolation. Once a letter is in the last region of its location, its
+           fractional part does not matter, so the order of the letters is not compared then.
+        """
+        capped = tuple(frozenset([self.cap(l) for l in letters]) for letters in exact_key)
+        if capped == key:
+            return True
+        letters = frozenset([l for ls in capped for l in ls])
+        if letters != frozenset([l for ls in key for l in ls]):
+            return False
+        return any(l[2] == self.last[l[0], l[1]] for l in letters)
+
+    def unextrapolate(self, steps):
+        """Follow the steps (key, delay successor, action) of a path from the initial letterword
+           in the Product without extrapolation, whose regions give the delays of the counterexample.
+        """
+        exact = Product(self.regions.max_time_value, self.A, self.B, False)
+        key = exact.init_key()
+        results = []
+        for i, (w, d, action) in enumerate(steps):
+            delays = [e for e in exact.delay_succ(key) if self.same(e, d) and self.same(exact.asucc(e, action), w)]
+            # The extrapolation is sound: each step of the path has an exact counterpart.
+            assert len(delays) > 0, "unextrapolate: no exact delay successor matches step %d (%s) of the path" % (i, action)
+            if d in delays:
+                delay = d
+            else:
+                delay = delays[0]
+            key = exact.asucc(delay, action)
+            results.append((key, delay, action))
+        return results
+
+class Reached(object):
+    """
+        The letterwords reached by explore, numbered in the order they are reached.
+        "index" for the number of each key;
+        "keys" for the key of each number;
+        "parents" for the number of the parent of each number, -1 for the initial letterword;
+        "labels" for the label of the step from the parent to each number;
+        "depths" for the number of actions from the initial letterword to each number.
+    """
+    def __init__(self, key):
+        self.index = {key: 0}
+        self.keys = [key]
+        self.parents = [-1]
+        self.labels = [None]
+        self.depths = [0]
+
+    def add(self, key, parent, label):
+        """Add key reached from the key parent by the step label. Return False if it was reached before.
+        """
+        if key in self.index:
+            return False
+        i = self.index[parent]
+        self.index[key] = len(self.keys)
+        self.keys.append(key)
+        self.parents.append(i)
+        self.labels.append(label)
+        self.depths.append(self.depths[i] + 1)
+        return True
+
+    def depth(self, key):
+        return self.depths[self.index[key]]
+
+    def path(self, key):
+        """The steps (key, label) from the initial letterword to key.
+        """
+        steps = []
+        i = self.index[key]
+        while i > 0:
+            steps.append((self.keys[i], self.labels[i]))
+            i = self.parents[i]
+        steps.reverse()
+        return steps
+
+def explore(product, is_bad, is_dead, stats=None):
+    """Explore the letterwords of the product (a Product or a ZoneProduct) in breadth-first
+       order and generate the keys of the bad ones, for which is_bad holds. So the bad
+       letterwords are generated by the number of actions reaching them, the shortest first.
+       The bad letterwords are explored further as well. The parents are recorded in
+       product.reached, see Reached.
+       The letterwords for which is_dead holds are not explored: no bad letterword can
+       be reached from them, and the successors of a dead letterword are dead too, so
+       the other letterwords are explored in the same order.
+       "stats" for the InclusionStats to count in.
+    """
+    w0 = product.init_key()
+    to_explore = deque([w0])
+    # every letterword ever put in to_explore is in reached. A letterword popped
+    # before is dominated by itself in explored, so it is not queued again.
+    reached = Reached(w0)
+    product.reached = reached
+    explored = product.new_antichain(stats)
+    while len(to_explore) > 0:
+        w = to_explore.popleft()
+        if is_bad(w):
+            yield w
+        if explored.dominated(w):
+            continue
+        for nw, label in product.successors(w):
+            if reached.add(nw, w, label):
+                if is_dead(nw):
+                    explored.stats.dead = explored.stats.dead + 1
+                else:
+                    to_explore.append(nw)
+        explored.add(w)
+
+def find_bad(product, stats=None):
+    """Return the key of the first bad letterword of the product, in case of L(B) is
+       a subset of L(A), or None if there is none.
+    """
+    for w in explore(product, product.is_bad, product.cannot_be_bad, stats):
+        return w
+    return None
+
+def find_difference(product, stats=None):
+    """Return the key of a letterword of the product in which exactly one of the locations
+       is accepting, with the fewest actions, by one exploration. Among the shortest ones,
+       it is the first bad letterword of the check of L(B) in L(A) if there is one, and
+       otherwise the first one of the check of L(A) in L(B). None if L(A) = L(B).
+    """
+    first = None
+    for w in explore(product, product.is_different, product.cannot_differ, stats):
+        if first is not None and product.reached.depth(w) > product.reached.depth(first):
+            return first
+        if product.is_bad(w):
+            return w
+        if first is None:
+            first = w
+    return first
+
+def ota_inclusion(max_time_value, A, B, stats=None):
     """Determin whether L(B) is a subset of L(A).
+       "stats" for the InclusionStats to count in.
+    """
+    product = Product(max_time_value, A, B)
+    w = find_bad(product, stats)
+    if w is None:
+        return True, None
+    return False, product.path_to_letterword(w)
+
+def ota_equivalence(max_time_value, A, B, stats=None):
+    """Determin whether L(A) = L(B) by one exploration, see find_difference.
+       "stats" for the InclusionStats to count in.
+    """
+    product = Product(max_time_value, A, B)
+    w = find_difference(product, stats)
+    if w is None:
+        return True, None
+    return False, product.path_to_letterword(w)
+
+def zone_bucket(key):
+    return key[0], key[1]
+
+def zone_covered(key1, key2):
+    """Whether the zone of key2 is a subset of the zone of key1, with the same locations.
+    """
+    return zone.includes(key1[2], key2[2])
+
+class ZoneProduct(object):
+    """
+        The product of A and B explored on zones by zone_inclusion and zone_equivalence.
+        A key is (location name of A, location name of B, DBM of the clock x of A and the
+        clock y of B), see zone.py. Unlike the regions of Product, the zones only split the
+        time at the constants of the guards, so their number does not grow with the values
+        of the constants. The DBMs are extrapolated by the max constants of A and B.
+        "A_trans" and "B_trans" for the transitions indexed by (source, action);
+        "A_live" and "B_live" for the locations which can reach acceptance;
+        "reached" for the keys reached by explore, see Reached.
     """
-    A_init_name = A.initstate_name
-    B_init_name = B.initstate_name
-    L1 = A.findlocationbyname(A_init_name)
-    Q1 = B.findlocationbyname(B_init_name)
-    w0 = [{Letter(L1, "[0,0]"), Letter(Q1, "[0,0]")}]
-    to_explore = []
-    to_explore.append(Letterword(w0,None,''))
-    explored = []
-    while True:
-        if len(to_explore) == 0:
-            return True, None
-        w = to_explore[0]
-        del to_explore[0]
-        if is_bad_letterword(w.lw, A, B):
-            return False, w
-        while explored_dominated(explored, w):
-            if len(to_explore) == 0:
-                return True, None
-            w = to_explore[0]
-            del to_explore[0]
-            if is_bad_letterword(w.lw, A, B):
-                return False, w
-        wsucc, next = compute_wsucc(w, max_time_value, A, B)
-        for nw in next:
-            if nw not in to_explore:
-                to_explore.append(nw)
-        if w not in explored:
-            explored.append(w)
+    def __init__(self, A, B):
+        self.A = A
+        self.B = B
+        self.max_x = A.max_time_value()
+        self.max_y = B.max_time_value()
+        self.A_trans = zone_trans(A)
+        self.B_trans = zone_trans(B)
+        self.A_accepts = set(A.accept_names)
+        self.B_accepts = set(B.accept_names)
+        self.A_live = live_locations(A)
+        self.B_live = live_locations(B)
+        self.reached = None
+
+    def init_key(self):
+        return (self.A.initstate_name, self.B.initstate_name, zone.zero())
+
+    def is_bad(self, key):
+        return key[1] in self.B_accepts and key[0] not in self.A_accepts
+
+    def is_different(self, key):
+        return (key[1] in self.B_accepts) != (key[0] in self.A_accepts)
+
+    def cannot_be_bad(self, key):
+        return key[1] not in self.B_live
+
+    def cannot_differ(self, key):
+        return key[0] not in self.A_live and key[1] not in self.B_live
+
+    def new_antichain(self, stats=None):
+        return Antichain(stats, zone_bucket, zone_covered)
+
+    def step(self, d, A_tran, B_tran):
+        """The DBM after a delay from d and the transitions A_tran and B_tran, not extrapolated,
+           and the DBM at the time of the transitions. None, None if they can not be taken.
+        """
+        d = zone.constrain(zone.up(d), 1, A_tran.constraints[0])
+        if d is None:
+            return None, None
+        d = zone.constrain(d, 2, B_tran.constraints[0])
+        if d is None:
+            return None, None
+        after = d
+        if A_tran.reset == True:
+            after = zone.reset(after, 1)
+        if B_tran.reset == True:
+            after = zone.reset(after, 2)
+        return after, d
+
+    def successors(self, key):
+        """The successors of key as (key, (action, A_tran, B_tran)).
+        """
+        A_name, B_name, d = key
+        results = []
+        for action in self.B.sigma:
+            for A_tran in self.A_trans.get((A_name, action), []):
+                for B_tran in self.B_trans.get((B_name, action), []):
+                    after, _ = self.step(d, A_tran, B_tran)
+                    if after is not None:
+                        after = zone.extrapolate(after, self.max_x, self.max_y)
+                        results.append(((A_tran.target, B_tran.target, after), (action, A_tran, B_tran)))
+        return results
+
+    def path_to_run(self, key):
+        """Return a run to key from the parents recorded by explore: the list of
+           (action, delay, A_tran, B_tran), with the delays as Fractions.
+        """
+        steps = [label for _, label in self.reached.path(key)]
+        # the exact zones along the path, after each step and at the time of each step
+        zones = [zone.zero()]
+        guarded = []
+        for action, A_tran, B_tran in steps:
+            after, d = self.step(zones[-1], A_tran, B_tran)
+            zones.append(after)
+            guarded.append(d)
+        # the valuations at the time of each step from which the rest of the path can be taken
+        ready = [None for step in steps]
+        w = zones[-1]
+        for i in range(len(steps)-1, -1, -1):
+            action, A_tran, B_tran = steps[i]
+            if A_tran.reset == True:
+                w = zone.free(w, 1)
+            if B_tran.reset == True:
+                w = zone.free(w, 2)
+            ready[i] = zone.intersect(guarded[i], w)
+            w = zone.intersect(zones[i], zone.down(ready[i]))
+        run = []
+        x, y = Fraction(0), Fraction(0)
+        for (action, A_tran, B_tran), d in zip(steps, ready):
+            delay = zone.pick(*zone.delay_interval(d, (x, y)))
+            x, y = x + delay, y + delay
+            if A_tran.reset == True:
+                x = Fraction(0)
+            if B_tran.reset == True:
+                y = Fraction(0)
+            run.append((action, delay, A_tran, B_tran))
+        return run
+
+def zone_trans(ota):
+    """Index the transitions of ota by (source, action), in the order of ota.trans.
+    """
+    names = set([l.name for l in ota.locations])
+    table = {}
+    for tran in ota.trans:
+        if tran.target in names:
+            table.setdefault((tran.source, tran.label), []).append(tran)
+    return table
+
+def zone_inclusion(A, B, stats=None):
+    """Determin whether L(B) is a subset of L(A) on zones, see ZoneProduct.
+       Return True, None or False and a run to a bad key (see ZoneProduct.path_to_run).
+       "stats" for the InclusionStats to count in.
+    """
+    product = ZoneProduct(A, B)
+    w = find_bad(product, stats)
+    if w is None:
+        return True, None
+    return False, product.path_to_run(w)
+
+def zone_equivalence(A, B, stats=None):
+    """Determin whether L(A) = L(B) on zones by one exploration, see find_difference and zone_inclusion.
+       "stats" for the InclusionStats to count in.
+    """
+    product = ZoneProduct(A, B)
+    w = find_difference(product, stats)
+    if w is None:
+        return True, None
+    return False, product.path_to_run(w)
+
+def run_to_dRTWs(run, ota, flag):
+    """Return the delay timedwords with the reset information of ota for a run of zone_inclusion,
+       in which ota is A if flag is 'A' and B otherwise. The integer delays are given as int.
+    """
+    drtws = []
+    for action, delay, A_tran, B_tran in run:
+        tran = A_tran if flag == 'A' else B_tran
+        if delay.denominator == 1:
+            delay = int(delay)
+        else:
+            delay = float(delay)
+        drtws.append(ResetTimedword(action, delay, tran.reset))
+    return drtws
+
+def is_accepting_letterword(letterword, ota):
+    """Whether the letter of ota in the last letterword of a path is in an accepting location.
+    """
+    flag = ota.locations[0].flag
+    for letters in letterword.lw:
+        for letter in letters:
+            if letter.location.flag == flag:
+                return letter.location.name in ota.accept_names
+    return False
 
 def findpath(letterword, flag, sigma):
     """When get a letterword, find the path ends in the letterword.
@@ -413,8 +1182,9 @@ def findpath(letterword, flag, sigma):
     current_lw = letterword
     path = [current_lw]
     while current_lw.prelw is not None:
-        path.insert(0, current_lw.prelw)
+        path.append(current_lw.prelw)
         current_lw = current_lw.prelw
+    path.reverse()
     return path
 
 def findDelayTimedwords(letterword, flag, sigma):
@@ -536,12 +1306,11 @@ def findDelayRTWs(letterword, flag, ota):
                 local_timedwords = Timedword(letterword.action,delay_time)
             else:
                 local_timedwords = Timedword(letterword.action,current_clock_valuation+delay_time)
-            for otatran in ota.trans:
-                if otatran.source == source_location.name and otatran.target == target_location.name and otatran.is_pass(local_timedwords):
-                    #print(source_location.name,target_location.name)
-                    reset = otatran.reset
-                    delay_resettimedwords.append(ResetTimedword(letterword.action,delay_time,reset))
-                    break
+            otatran = ota.find_tran(source_location.name, letterword.action, local_timedwords.time)
+            if otatran is not None and otatran.target == target_location.name:
+                #print(source_location.name,target_location.name)
+                reset = otatran.reset
+                delay_resettimedwords.append(ResetTimedword(letterword.action,delay_time,reset))
             current_clock_valuation = minnum_in_region(temp_region)
         elif letterword.action == '':
             pass
@@ -563,32 +1332,43 @@ def dTWs_to_dRTWs(letterword,flag, ota):
                 current_clock_valuation = current_clock_valuation + tw.time
             else:
                 current_clock_valuation = tw.time
-            for tran in ota.trans:
-                if tran.source == current_location and tran.is_pass(Timedword(tw.action,current_clock_valuation)):
-                    dRTWs.append(ResetTimedword(tw.action,tw.time,tran.reset))
-                    reset = tran.reset
-                    break
+            tran = ota.find_tran(current_location, tw.action, current_clock_valuation)
+            if tran is not None:
+                dRTWs.append(ResetTimedword(tw.action,tw.time,tran.reset))
+                reset = tran.reset
     return dRTWs
 
 
-def equivalence_query(max_time_value, teacher, hypothesis):
+def equivalence_query(max_time_value, teacher, hypothesis, stats=None, symbolic=False):
     """
+        Return True, None if the hypothesis is equivalent to the teacher, otherwise False and
+        a counterexample, whose value is [1] if the teacher accepts it (a positive one) and [0] if not.
+        "stats" for the InclusionStats to count in;
+        "symbolic" for checking on zones, see ZoneProduct, instead of the regions of max_time_value.
     """
-    flag_pos, w_pos = ota_inclusion(max_time_value, hypothesis, teacher)
-    if flag_pos == False:
-        #drtw_pos = findDelayRTWs(w_pos, 's', teacher)
-        drtw_pos = dTWs_to_dRTWs(w_pos, 's', teacher)
-        ctx_pos = Element(drtw_pos, [])
-        return False, ctx_pos
-    else:
-        flag_neg, w_neg = ota_inclusion(max_time_value, teacher, hypothesis)
-        if flag_neg == False:
-            #drtw_neg = findDelayRTWs(w_neg, 's', teacher)
-            drtw_neg = dTWs_to_dRTWs(w_neg, 's', teacher)
-            ctx_neg = Element(drtw_neg, [])
-            return False, ctx_neg
+    if symbolic == True:
+        flag, run = zone_equivalence(hypothesis, teacher, stats)
+        if flag == False:
+            drtw = run_to_dRTWs(run, teacher, 'B')
+            location = teacher.initstate_name
+            if len(run) > 0:
+                location = run[-1][3].target
+            if location in teacher.accept_names:
+                return False, Element(drtw, [1])
+            else:
+                return False, Element(drtw, [0])
+        return True, None
+    flag, w = ota_equivalence(max_time_value, hypothesis, teacher, stats)
+    if flag == False:
+        #drtw = findDelayRTWs(w, 's', teacher)
+        drtw = dTWs_to_dRTWs(w, 's', teacher)
+        if is_accepting_letterword(w, teacher):
+            ctx = Element(drtw, [1])
         else:
-            return True, None
+            ctx = Element(drtw, [0])
+        return False, ctx
+    else:
+        return True, None
 
 # def dRTWs_to_lRTWs(delay_resettimedwords):
 #     """Given a delay reset-timedwords, return the local reset-timedwords.
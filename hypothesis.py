@@ -1,6 +1,8 @@
+from bisect import bisect_left, bisect_right
 from fa import FAState, FATran, FA
-from interval import Constraint
+from interval import Constraint, INFCODE, lower_code, upper_code, unintersect_intervals, intervals_partition
 from ota import Location, OTA, OTATran
+from otatable import tws_key
 #from otatable import *
 
 def to_fa(otatable, n):
@@ -35,7 +37,12 @@ def to_fa(otatable, n):
         temp_state = FAState(name, init, accept)
         states.append(temp_state)
     ## FATrans
-    trans_number = 0
+    # the state of each timedword of S U R, and the transition of each (source, target, action, reset)
+    tws_state_dict = {}
+    for element in table_elements:
+        tws_state_dict[tws_key(element.tws)] = value_name_dict[element.whichstate()]
+    tran_dict = {}
+    rtw_set = set()
     trans = []
     for r in table_elements:
         if r.tws == []:
@@ -43,28 +50,21 @@ def to_fa(otatable, n):
         resettimedwords = [tw for tw in r.tws]
         w = resettimedwords[:-1]
         a = resettimedwords[len(resettimedwords)-1]
-        if a not in rtw_alphabet:
+        if a not in rtw_set:
+            rtw_set.add(a)
             rtw_alphabet.append(a)
-        source = ""
-        target = ""
-        #label = [a]
-        for element in table_elements:
-            if w == element.tws:
-                source = value_name_dict[element.whichstate()]
-            if resettimedwords == element.tws:
-                target = value_name_dict[element.whichstate()]
-        need_newtran = True
-        for tran in trans:
-            if source == tran.source and target == tran.target:
-                if a.action == tran.label[0].action and a.reset == tran.label[0].reset:
-                    need_newtran = False
-                    if a not in tran.label:
-                        tran.label.append(a)
-                    break
-        if need_newtran == True:
-            temp_tran = FATran(trans_number, source, target, [a])
+        source = tws_state_dict.get(tws_key(w), "")
+        target = tws_state_dict[tws_key(resettimedwords)]
+        key = (source, target, a.action, a.reset)
+        if key in tran_dict:
+            tran, labels = tran_dict[key]
+            if a not in labels:
+                labels.add(a)
+                tran.label.append(a)
+        else:
+            temp_tran = FATran(len(trans), source, target, [a])
             trans.append(temp_tran)
-            trans_number = trans_number + 1
+            tran_dict[key] = (temp_tran, set([a]))
     fa = FA("FA_"+str(n),rtw_alphabet,states,trans,initstate_name,accept_names)
     return fa , sink_name
 
@@ -80,72 +80,276 @@ def fa_to_ota(fa, sink_name, sigma, n):
         if l.name == sink_name:
             l.sink = True
     ### generate the transitions
+    source_trans = fa_source_trans(fa)
     trans = []
     for s in fa.states:
-        s_dict = {}
-        for key in sigma:
-            s_dict[key] = []
-        for tran in fa.trans:
-            if tran.source == s.name:
-                s_dict[tran.label[0].action].extend([rtw.time for rtw in tran.label])
-        for tran in fa.trans:
-            if tran.source == s.name:
-                timepoints = [time for time in s_dict[tran.label[0].action]]
-                timepoints.sort()
-                for rtw in tran.label:
-                    index = timepoints.index(rtw.time)
-                    temp_constraint = None
-                    ## By now, we assuem that the timepoints are interger numbers.
-                    # if index + 1 < len(timepoints):
-                    #     temp_constraint = Constraint("[" + str(rtw.time) + "," + str(timepoints[index+1]) + ")")
-                    # else:
-                    #     temp_constraint = Constraint("[" + str(rtw.time) + "," + "+" + ")")
-                    ## Consider the float timepoints
-                    if index + 1 < len(timepoints):
-                        if isinstance(rtw.time,int) and isinstance(timepoints[index+1], int):
-                            temp_constraint = Constraint("[" + str(rtw.time) + "," + str(timepoints[index+1]) + ")")
-                        elif isinstance(rtw.time,int) and not isinstance(timepoints[index+1], int):
-                            temp_constraint = Constraint("[" + str(rtw.time) + "," + str(int(timepoints[index+1])) + "]")
-                        elif not isinstance(rtw.time,int) and isinstance(timepoints[index+1], int):
-                            temp_constraint = Constraint("(" + str(int(rtw.time)) + "," + str(timepoints[index+1]) + ")")
-                        else:
-                            temp_constraint = Constraint("(" + str(int(rtw.time)) + "," + str(int(timepoints[index+1])) + "]")
-                    else:
-                        if isinstance(rtw.time,int):
-                            temp_constraint = Constraint("[" + str(rtw.time) + "," + "+" + ")")
-                        else:
-                            temp_constraint = Constraint("(" + str(int(rtw.time)) + "," + "+" + ")")
-                    temp_tran = OTATran(len(trans), tran.source, tran.label[0].action, [temp_constraint], rtw.reset, tran.target, 'q')
-                    trans.append(temp_tran)
+        trans.extend(location_trans(source_trans.get(s.name, []), len(trans)))
     ota = OTA(new_name,sigma,states,trans,initstate_name,accept_names)
     ota.sink_name = sink_name
     return ota
 
+def fa_source_trans(fa):
+    """Return the transitions of fa from each state name, in the order of fa.trans.
+    """
+    source_trans = {}
+    for tran in fa.trans:
+        source_trans.setdefault(tran.source, []).append(tran)
+    return source_trans
+
+def location_trans(s_trans, first_id):
+    """Return the OTATrans of the FA transitions s_trans from one state, numbered from first_id.
+    """
+    s_dict = {}
+    for tran in s_trans:
+        s_dict.setdefault(tran.label[0].action, set()).update([rtw.time for rtw in tran.label])
+    ## one sorted sweep for each action: the next time point of each time point.
+    ## A time point in several labels gets the same guard in all of them.
+    next_dict = {}
+    for action, times in s_dict.items():
+        timepoints = sorted(times)
+        for time, next_time in zip(timepoints, timepoints[1:] + [None]):
+            next_dict[(action, time)] = next_time
+    trans = []
+    for tran in s_trans:
+        for rtw in tran.label:
+            temp_constraint = timepoint_guard(rtw.time, next_dict[(tran.label[0].action, rtw.time)])
+            temp_tran = OTATran(first_id + len(trans), tran.source, tran.label[0].action, [temp_constraint], rtw.reset, tran.target, 'q')
+            trans.append(temp_tran)
+    return trans
+
+class HypothesisBuilder(object):
+    """
+        Build the hypotheses of the successive tables of a learning run, as to_fa and fa_to_ota
+        followed by combine_transitions and minimize_locations.
+        Each hypothesis is patched from the previous one: the location and the transitions
+        of a state whose acceptance and outgoing FA transitions did not change are kept, the
+        transitions being copied with new numbers.
+        The hypothesis built has "changed" for the names of the locations whose transitions are
+        not those of the previous hypothesis, and "base_table" for the successor table of the
+        previous one, see equivalence.successor_table.
+        "sigma" for the labels list;
+        "hypothesis" for the last hypothesis built;
+        "outs" for what is compared of each state in the last table;
+        "locations" for the location of each state name in the last table;
+        "trans" for the transitions from each state name in the last table;
+        "outgoing" for what is compared of the transitions from each location of the last hypothesis.
+    """
+    def __init__(self, sigma):
+        self.sigma = sigma
+        self.hypothesis = None
+        self.outs = {}
+        self.locations = {}
+        self.trans = {}
+        self.outgoing = {}
+
+    def build(self, table, n):
+        """Return the hypothesis of the table, the n-th one.
+        """
+        fa, sink_name = to_fa(table, n)
+        source_trans = fa_source_trans(fa)
+        outs = {}
+        locations = {}
+        trans = {}
+        all_locations = []
+        all_trans = []
+        for s in fa.states:
+            s_trans = source_trans.get(s.name, [])
+            out = (s.init, s.accept, s.name == sink_name, tuple((tran.target, tuple(tran.label)) for tran in s_trans))
+            if self.outs.get(s.name) == out:
+                location = self.locations[s.name]
+                s_ota_trans = [OTATran(len(all_trans) + i, tran.source, tran.label, tran.constraints, tran.reset, tran.target, tran.flag)
+                               for i, tran in enumerate(self.trans[s.name])]
+            else:
+                location = Location(s.name, s.init, s.accept, 'q')
+                location.sink = s.name == sink_name
+                s_ota_trans = combine_location_trans(location_trans(s_trans, 0), len(all_trans))
+            outs[s.name] = out
+            locations[s.name] = location
+            trans[s.name] = s_ota_trans
+            all_locations.append(location)
+            all_trans.extend(s_ota_trans)
+        ota = OTA("H_" + str(n), self.sigma, all_locations, all_trans, fa.initstate_name, [name for name in fa.accept_names])
+        ota.sink_name = sink_name
+        ota = minimize_locations(ota)
+        outgoing = {}
+        for tran in ota.trans:
+            outgoing.setdefault(tran.source, []).append((tran.label, tran.constraints[0].min_code, tran.constraints[0].max_code, tran.reset, tran.target))
+        ota.changed = set(location.name for location in ota.locations if self.outgoing.get(location.name) != outgoing.get(location.name))
+        if self.hypothesis is not None:
+            ota.base_table = self.hypothesis.succ_table
+        self.hypothesis = ota
+        self.outs = outs
+        self.locations = locations
+        self.trans = trans
+        self.outgoing = outgoing
+        return ota
+
+def timepoint_guard(time, next_time):
+    """The guard from the time point time to the next time point next_time (None if there is none).
+       An integer time point n is the region [n,n] and a float one n.1 the region (n,n+1),
+       so the guard is [n or (n, and n) or n] up to the region of next_time, or +) if there is none.
+    """
+    if isinstance(time, int):
+        min_code = lower_code(time, True)
+    else:
+        min_code = lower_code(int(time), False)
+    if next_time is None:
+        max_code = INFCODE
+    elif isinstance(next_time, int):
+        max_code = upper_code(next_time, False)
+    else:
+        max_code = upper_code(int(next_time), True)
+    return Constraint.from_codes(min_code, max_code)
+
 def remove_sinklocation(ota):
-    """Remove the sink location of the ota.
+    """Remove the sink location of the ota. The other locations are renamed 1, 2, ... in order,
+    the ota itself is not changed.
     """
-    new_name = ota.name
-    temp_locations = [location for location in ota.locations if location.sink == False]
-    temp_trans = [tran for tran in ota.trans if tran.target != ota.sink_name]
-    initstate_name = ""
-    accept_names = []
-    for location, i in zip(temp_locations,range(0,len(temp_locations))):
-        new_name = str(i+1)
-        if location.init == True:
-            initstate_name = new_name
-        if location.accept == True:
-            accept_names.append(new_name)
-        for tran, j in zip(temp_trans, range(0,len(temp_trans))):
-            tran.id = j
-            if location.name == tran.source:
-                tran.source = new_name
-            if location.name == tran.target:
-                tran.target = new_name
-        location.name = new_name
-    return OTA(ota.name,ota.sigma,temp_locations,temp_trans,initstate_name,accept_names)
+    names = {}
+    locations = []
+    for location in ota.locations:
+        if location.sink == False:
+            names[location.name] = str(len(locations)+1)
+            locations.append(Location(names[location.name], location.init, location.accept, location.flag))
+    trans = []
+    for tran in ota.trans:
+        if tran.source in names and tran.target in names and tran.target != ota.sink_name:
+            trans.append(OTATran(len(trans), names[tran.source], tran.label, tran.constraints, tran.reset, names[tran.target], tran.flag))
+    initstate_name = names.get(ota.initstate_name, "")
+    accept_names = [location.name for location in locations if location.accept == True]
+    return OTA(ota.name,ota.sigma,locations,trans,initstate_name,accept_names)
+
+def combine_location_trans(trans, first_id):
+    """Combine the transitions from one location which have the same action, the same reset
+    and the same target location: their guards are merged into the fewest intervals (see
+    unintersect_intervals). Return the transitions numbered from first_id, in the order of
+    the first transition of each group.
+    """
+    groups = {}
+    keys = []
+    for tran in trans:
+        key = (tran.label, tran.reset, tran.target)
+        if key not in groups:
+            groups[key] = []
+            keys.append(key)
+        groups[key].append(tran)
+    combined = []
+    for key in keys:
+        group = groups[key]
+        if len(group) == 1:
+            constraints = group[0].constraints
+        else:
+            constraints = unintersect_intervals([c for tran in group for c in tran.constraints])
+        for constraint in constraints:
+            tran = group[0]
+            combined.append(OTATran(first_id + len(combined), tran.source, tran.label, [constraint], tran.reset, tran.target, tran.flag))
+    return combined
 
 def combine_transitions(ota):
     """Combine the transitions of which have the same source location, the same target location, 
-    the same action, and the same reset.
+    the same action, and the same reset. Return the combined OTA, with the same language.
     """
-    return 0
+    source_trans = {}
+    for tran in ota.trans:
+        source_trans.setdefault(tran.source, []).append(tran)
+    trans = []
+    for location in ota.locations:
+        trans.extend(combine_location_trans(source_trans.pop(location.name, []), len(trans)))
+    for name, s_trans in source_trans.items():
+        trans.extend(combine_location_trans(s_trans, len(trans)))
+    combined = OTA(ota.name, ota.sigma, ota.locations, trans, ota.initstate_name, ota.accept_names)
+    combined.sink_name = ota.sink_name
+    return combined
+
+def minimize_locations(ota):
+    """Merge the equivalent locations of the deterministic ota, by Hopcroft's partition refinement.
+    The guards of each action are cut at all their ends into intervals, the symbols, so that a
+    location has at most one transition on each symbol. Two locations are equivalent if they
+    have the same acceptance, the same symbols with transitions, and on each of them the same
+    reset and equivalent targets. Return the ota itself if no locations are equivalent, or if
+    guards overlap, as in a hypothesis where a time point is reached with and without reset from
+    equal rows. Otherwise return the OTA with one location for each class, named after its
+    initial location, or its sink location, or its first location, and with combined transitions.
+    """
+    names = [location.name for location in ota.locations]
+    number = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    guards = {}
+    for tran in ota.trans:
+        guards.setdefault(tran.label, []).extend(tran.constraints)
+    symbols = {}
+    k = 0
+    for action, constraints in guards.items():
+        partitions, _ = intervals_partition(constraints)
+        symbols[action] = (k, [c.min_code for c in partitions], [c.max_code for c in partitions])
+        k += len(partitions)
+    # The transitions on each symbol from each location, and the sources on each symbol to each location.
+    outs = [dict() for _ in range(n)]
+    preds = [dict() for _ in range(n)]
+    for tran in ota.trans:
+        if tran.source not in number or tran.target not in number:
+            continue
+        source, target = number[tran.source], number[tran.target]
+        first_symbol, mins, maxs = symbols[tran.label]
+        for constraint in tran.constraints:
+            for a in range(first_symbol + bisect_left(mins, constraint.min_code), first_symbol + bisect_right(maxs, constraint.max_code)):
+                if a in outs[source]:
+                    return ota
+                outs[source][a] = tran.reset
+                preds[target].setdefault(a, []).append(source)
+    # A location with no transition on a symbol is only with locations with none either,
+    # so the missing transitions never split a class.
+    blocks = []
+    block_of = [0] * n
+    classes = {}
+    for s, location in enumerate(ota.locations):
+        output = (location.accept, tuple(sorted(outs[s].items())))
+        if output not in classes:
+            classes[output] = len(blocks)
+            blocks.append(set())
+        block_of[s] = classes[output]
+        blocks[block_of[s]].add(s)
+    waiting = list(range(len(blocks)))
+    is_waiting = [True] * len(blocks)
+    while waiting:
+        b = waiting.pop()
+        is_waiting[b] = False
+        sources = {}
+        for t in blocks[b]:
+            for a, a_sources in preds[t].items():
+                sources.setdefault(a, []).extend(a_sources)
+        for a, a_sources in sources.items():
+            touched = {}
+            for s in a_sources:
+                touched.setdefault(block_of[s], []).append(s)
+            for c, members in touched.items():
+                if len(members) == len(blocks[c]):
+                    continue
+                new = len(blocks)
+                blocks.append(set(members))
+                blocks[c].difference_update(members)
+                for s in members:
+                    block_of[s] = new
+                if is_waiting[c] or len(members) <= len(blocks[c]):
+                    waiting.append(new)
+                    is_waiting.append(True)
+                else:
+                    waiting.append(c)
+                    is_waiting[c] = True
+                    is_waiting.append(False)
+    if len(blocks) == n:
+        return ota
+    representative = {}
+    for i, location in sorted(enumerate(ota.locations), key=lambda p: (not p[1].init, not p[1].sink, p[0])):
+        representative.setdefault(block_of[i], i)
+    rename = {name: names[representative[block_of[i]]] for i, name in enumerate(names)}
+    locations = [location for location in ota.locations if rename[location.name] == location.name]
+    trans = [OTATran(tran.id, tran.source, tran.label, tran.constraints, tran.reset, rename[tran.target], tran.flag)
+             for tran in ota.trans if rename.get(tran.source) == tran.source and tran.target in rename]
+    minimized = combine_transitions(OTA(ota.name, ota.sigma, locations, trans, rename[ota.initstate_name],
+                                        [location.name for location in locations if location.accept]))
+    # The sink is kept only if it is the location of its class, which is not the case when the
+    # initial location is in its class, the ota accepting nothing.
+    if rename.get(ota.sink_name, ota.sink_name) == ota.sink_name:
+        minimized.sink_name = ota.sink_name
+    return minimized
@@ -15,66 +15,87 @@ class Bracket(IntEnum):
     RC = 3
     LO = 4
 
+# A bracket number is encoded as the integer 4*value + bracket - 1, so the
+# order of the codes is the order of the bracket numbers: at the same value,
+# RO < LC < RC < LO. Every '+' is encoded as the sentinel INFCODE.
+INFCODE = 4 * (MAXVALUE + 1)
+
+def bn_code(value, bracket):
+    """Encode a bracket number (value string, bracket) as an integer.
+    """
+    if value == '+':
+        return INFCODE
+    return 4 * int(value) + bracket - 1
+
+def lower_code(value, closed):
+    """The code of the left end of an interval, "[value" or "(value".
+    """
+    if value == '+':
+        return INFCODE
+    if closed == True:
+        return 4 * int(value) + 1
+    else:
+        return 4 * int(value) + 3
+
+def upper_code(value, closed):
+    """The code of the right end of an interval, "value]" or "value)".
+    """
+    if value == '+':
+        return INFCODE
+    if closed == True:
+        return 4 * int(value) + 2
+    else:
+        return 4 * int(value)
+
+def code_value(code):
+    """The value string of a code, '+' for INFCODE.
+    """
+    if code == INFCODE:
+        return '+'
+    return str(code >> 2)
+
+def complement_code(code):
+    """The code of the complement bracket number: [a <-> a) and a] <-> (a.
+    '+' and '[0' are their own complements.
+    """
+    if code == INFCODE or code == 1:
+        return code
+    return code ^ 1
+
+def point_codes(num):
+    """The codes of the ends of the smallest region containing the number num,
+    [n,n] for an integer n and (n,n+1) otherwise. An interval contains num if and
+    only if its min_code is not greater and its max_code is not smaller.
+    """
+    integer = int(num)
+    if num == integer:
+        return 4 * integer + 1, 4 * integer + 2
+    else:
+        return 4 * integer + 3, 4 * integer + 4
+
 class BracketNum:
+    __slots__ = ('value', 'bracket', 'code')
     def __init__(self, value="", bracket=0):
         self.value = value
         self.bracket = bracket
+        self.code = bn_code(value, bracket) if value != "" else 0
     def __eq__(self, bn):
         if self.value == bn.value and self.bracket == bn.bracket:
             return True
         else:
             return False
+    def __hash__(self):
+        return hash(("BRACKETNUM", self.value, self.bracket))
     def __lt__(self, bn):
-        if self.value == '+':
-            return False
-        if bn.value == '+':
-            return True
-        if int(self.value) > int(bn.value):
-            return False
-        elif int(self.value) < int(bn.value):
-            return True
-        else:
-            if self.bracket < bn.bracket:
-                return True
-            else:
-                return False
+        return self.code < bn.code
     def __gt__(self, bn):
-        if self.value == '+':
-            if bn.value == '+':
-                return False
-            else:
-                return True
-        if bn.value == '+':
-            return False
-        if int(self.value) > int(bn.value):
-            return True
-        elif int(self.value) < int(bn.value):
-            return False
-        else:
-            if self.bracket > bn.bracket:
-                return True
-            else:
-                return False
+        return self.code > bn.code
     def __ge__(self, bn):
         return not self.__lt__(bn)
     def __le__(self, bn):
         return not self.__gt__(bn)
     def complement(self):
-        if self.value == '+':
-            return BracketNum('+', Bracket.RO)  #ceil
-        if self.value == '0' and self.bracket == Bracket.LC:
-            return BracketNum('0', Bracket.LC)  #floor
-        temp_value = self.value
-        temp_bracket = None
-        if self.bracket == Bracket.LC:
-            temp_bracket = Bracket.RO
-        if self.bracket == Bracket.RC:
-            temp_bracket = Bracket.LO
-        if self.bracket == Bracket.LO:
-            temp_bracket = Bracket.RC
-        if self.bracket == Bracket.RO:
-            temp_bracket = Bracket.LC
-        return BracketNum(temp_value, temp_bracket)
+        return code_to_bn(complement_code(self.code))
     def getIntvalue(self):
         if self.value == '+':
             return MAXVALUE
@@ -90,47 +111,77 @@ class BracketNum:
         if self.bracket == Bracket.RO:
             return self.value + ')'
 
+def code_to_bn(code):
+    """Decode an integer code to a BracketNum.
+    """
+    if code == INFCODE:
+        return BracketNum('+', Bracket.RO)
+    return BracketNum(str(code >> 2), Bracket((code & 3) + 1))
+
 class Constraint:
-    guard=None
-    min_value = ""
-    closed_min = True
-    max_value = ""
-    closed_max = True
-    min_bn = None
-    max_bn = None
+    """
+        An interval over the clock values. The ends are stored as the integer
+        codes "min_code" and "max_code" (see bn_code), the guard string and the
+        value strings are derived from them on demand.
+    """
+    __slots__ = ('min_code', 'max_code', '_guard')
     def __init__(self, guard=None):
-        self.guard = guard
+        self._guard = guard
         self.__build()
-    
+
     def __build(self):
-        min_type, max_type = self.guard.split(',')
-        min_bn_bracket = None
-        max_bn_bracket = None
-        if min_type[0] == '[':
-            self.closed_min = True
-            min_bn_bracket = Bracket.LC
-        else:
-            self.closed_min = False
-            min_bn_bracket = Bracket.LO
-        self.min_value = min_type[1:].strip()
-        self.min_bn = BracketNum(self.min_value, min_bn_bracket)
-        if max_type[-1] == ']':
-            self.closed_max = True
-            max_bn_bracket = Bracket.RC
-        else:
-            self.closed_max = False
-            max_bn_bracket = Bracket.RO
-        self.max_value = max_type[:-1].strip()
-        self.max_bn = BracketNum(self.max_value, max_bn_bracket)
-    
+        min_type, max_type = self._guard.split(',')
+        self.min_code = lower_code(min_type[1:].strip(), min_type[0] == '[')
+        self.max_code = upper_code(max_type[:-1].strip(), max_type[-1] == ']')
+
+    @classmethod
+    def from_codes(cls, min_code, max_code):
+        """Build a constraint from the codes of its ends, without any parsing.
+        """
+        constraint = cls.__new__(cls)
+        constraint.min_code = min_code
+        constraint.max_code = max_code
+        constraint._guard = None
+        return constraint
+
+    @property
+    def guard(self):
+        if self._guard is None:
+            self._guard = self.min_bn.getbn() + ',' + self.max_bn.getbn()
+        return self._guard
+
+    @property
+    def min_value(self):
+        return code_value(self.min_code)
+
+    @property
+    def max_value(self):
+        return code_value(self.max_code)
+
+    @property
+    def closed_min(self):
+        return self.min_code & 3 == 1
+
+    @property
+    def closed_max(self):
+        return self.max_code & 3 == 2
+
+    @property
+    def min_bn(self):
+        return code_to_bn(self.min_code)
+
+    @property
+    def max_bn(self):
+        return code_to_bn(self.max_code)
+
     def __eq__(self, constraint):
-        if self.min_value == constraint.min_value and self.closed_min == constraint.closed_min and self.max_value == constraint.max_value and self.closed_max == constraint.closed_max:
+        if self.min_code == constraint.min_code and self.max_code == constraint.max_code:
             return True
         else:
             return False
-            
+
     def __hash__(self):
-        return hash(("CONSTRAINT", self.min_value, self.closed_min, self.max_value, self.closed_max))
+        return hash(("CONSTRAINT", self.min_code, self.max_code))
 
     def __add__(self, constraint):
         if self.isEmpty() == True or constraint.isEmpty() == True:
@@ -146,27 +197,19 @@ class Constraint:
                 temp_max_value = '+'
             else:
                 temp_max_value = str(int(self.max_value) + int(constraint.max_value))
-            temp_closed_min = '('
-            temp_closed_max = ')'
-            if self.closed_min == True and constraint.closed_min == True:
-                temp_closed_min = '['
-            if self.closed_max == True and constraint.closed_max == True:
-                temp_closed_max = ']'
-            guard = temp_closed_min + temp_min_value + ',' + temp_max_value + temp_closed_max
-            return Constraint(guard)
+            temp_closed_min = self.closed_min == True and constraint.closed_min == True
+            temp_closed_max = self.closed_max == True and constraint.closed_max == True
+            return Constraint.from_codes(lower_code(temp_min_value, temp_closed_min), upper_code(temp_max_value, temp_closed_max))
+
     def complement(self):
         if self.isEmpty() == True:
             return Constraint("[0,+)")
-        complement_min_bn = self.min_bn.complement()
-        complement_max_bn = self.max_bn.complement()
-        left_constraint = None
-        right_constraint = None
         complement_intervals = []
-        if self.min_bn > BracketNum('0', Bracket.LC):
-            left_constraint = Constraint('['+'0'+','+complement_min_bn.getbn())
+        if self.min_code > 1:
+            left_constraint = Constraint.from_codes(1, complement_code(self.min_code))
             complement_intervals.append(left_constraint)
-        if self.max_bn < BracketNum('+', Bracket.RO):
-            right_constraint = Constraint(complement_max_bn.getbn()+','+'+'+')')
+        if self.max_code < INFCODE:
+            right_constraint = Constraint.from_codes(complement_code(self.max_code), INFCODE)
             complement_intervals.append(right_constraint)
         if len(complement_intervals) > 0:
             return complement_intervals, True
@@ -174,57 +217,38 @@ class Constraint:
             return [Constraint("(0,0)")], False
 
     def isEmpty(self):
-        if self.max_bn < self.min_bn:
-            return True
-        else:
-            return False
-    
+        return self.max_code < self.min_code
+
     def isininterval(self, num):
-        #if self.max_value == '+':
-            #return True
-        if num < self.get_min():
+        min_value = self.min_code >> 2
+        if num < min_value:
             return False
-        elif num == self.get_min():
-            if self.closed_min == True:
-                return True
-            else:
-                return False
-        elif num > self.get_min() and num < self.get_max():
+        elif num == min_value:
+            return self.min_code & 3 == 1
+        if self.max_code == INFCODE:
             return True
-        elif num == self.get_max():
-            if self.closed_max == True:
-                return True
-            else:
-                return False
+        max_value = self.max_code >> 2
+        if num < max_value:
+            return True
+        elif num == max_value:
+            return self.max_code & 3 == 2
         else:
             return False
 
     def isPoint(self):
-        if self.min_value == '+' or self.max_value == '+':
-            return False
-        if self.min_value == self.max_value and self.closed_min == True and self.closed_max == True:
-            return True
-        else:
-            return False
+        return self.min_code & 3 == 1 and self.max_code == self.min_code + 1
 
     def issubset(self, c2):
-        min_bn1 = self.min_bn
-        max_bn1 = self.max_bn
-        min_bn2 = c2.min_bn
-        max_bn2 = c2.max_bn
-        if min_bn1 >= min_bn2 and max_bn1 <= max_bn2:
-            return True
-        else:
-            return False
+        return self.min_code >= c2.min_code and self.max_code <= c2.max_code
+
     def get_min(self):
-        return int(self.min_value)
-    
+        return self.min_code >> 2
+
     def get_max(self):
-        if self.max_value == '+':
-            closed_max=False
+        if self.max_code == INFCODE:
             return MAXVALUE
         else:
-            return int(self.max_value)
+            return self.max_code >> 2
 
     def show(self):
         return self.guard
@@ -268,30 +292,17 @@ def min_constraints_number(cs):
 def intersect_constraint(c1, c2):
     if c1.isEmpty() == True or c2.isEmpty() == True:
         return Constraint("(0,0)"), False
-    min_bn1 = c1.min_bn
-    max_bn1 = c1.max_bn
-    min_bn2 = c2.min_bn
-    max_bn2 = c2.max_bn
-    bnlist = [min_bn1, max_bn1, min_bn2, max_bn2]
-    bnlist.sort()
-    left_bn = bnlist[1]
-    right_bn = bnlist[2]
-    if left_bn in [min_bn1, min_bn2] and right_bn in [max_bn1, max_bn2]:
-        return Constraint(left_bn.getbn()+','+right_bn.getbn()), True
+    min_code = max(c1.min_code, c2.min_code)
+    max_code = min(c1.max_code, c2.max_code)
+    if min_code < max_code:
+        return Constraint.from_codes(min_code, max_code), True
     else:
         return Constraint("(0,0)"), False
 
 def constraint_subset(c1, c2):
     """Determin whether c1 is a subset of c2.
     """
-    min_bn1 = c1.min_bn
-    max_bn1 = c1.max_bn
-    min_bn2 = c2.min_bn
-    max_bn2 = c2.max_bn
-    if min_bn1 >= min_bn2 and max_bn1 <= max_bn2:
-        return True
-    else:
-        return False
+    return c1.min_code >= c2.min_code and c1.max_code <= c2.max_code
     
 def constraint_contain(c, intervals):
     intertemp = []
@@ -314,21 +325,13 @@ def union_constraint(c1, c2):
         return c2, 1
     if c2.isEmpty() == True:
         return c1, 1
-    sortlist = [c1,c2]
-    #lqsort(sortlist, 0, len(sortlist)-1)
-    lbsort(sortlist)
-    if sortlist[1].min_bn.getIntvalue() < sortlist[0].max_bn.getIntvalue():
-        temp_bn = sortlist[0].max_bn
-        if sortlist[0].max_bn < sortlist[1].max_bn:
-            temp_bn = sortlist[1].max_bn
-        return Constraint(sortlist[0].min_bn.getbn()+','+temp_bn.getbn()), 1
-    elif sortlist[1].min_bn.getIntvalue() == sortlist[0].max_bn.getIntvalue():
-        if sortlist[0].max_bn.bracket == Bracket.RO and sortlist[1].min_bn.bracket == Bracket.LO:
-            return sortlist, 2
-        else:
-            return Constraint(sortlist[0].min_bn.getbn()+','+sortlist[1].max_bn.getbn()), 1
+    if c2.min_code < c1.min_code:
+        c1, c2 = c2, c1
+    # "a)" and "(a" are the only adjacent ends which do not touch.
+    if c2.min_code <= c1.max_code + 1:
+        return Constraint.from_codes(c1.min_code, max(c1.max_code, c2.max_code)), 1
     else:
-        return sortlist, 2
+        return [c1, c2], 2
 
 def union_constraints(cs):
     intervals = copy.deepcopy(cs)
@@ -347,32 +350,19 @@ def union_constraints(cs):
     return union_intervals
 
 def intervals_partition(intervals):
-    partitions = []
-    floor_bn = BracketNum('0',Bracket.LC)
-    ceil_bn = BracketNum('+',Bracket.RO)
-    key_bns = []
+    key_codes = set()
     for constraint in intervals:
-        min_bn = constraint.min_bn
-        max_bn = constraint.max_bn
-        if min_bn not in key_bns:
-            key_bns+= [min_bn]
-        if max_bn not in key_bns:
-            key_bns+=[max_bn]
-    key_bnsc = copy.deepcopy(key_bns)
-    for bn in key_bns:
-        bnc = bn.complement()
-        if bnc not in key_bnsc:
-            key_bnsc.append(bnc)
-    if floor_bn not in key_bnsc:
-        key_bnsc.append(floor_bn)
-    if ceil_bn not in key_bnsc:
-        key_bnsc.append(ceil_bn)
-    key_bnsc.sort()
-    for index in range(len(key_bnsc)):
-        if index%2 == 0:
-            temp_constraint = Constraint(key_bnsc[index].getbn()+','+key_bnsc[index+1].getbn())
-            partitions.append(temp_constraint)
-    return partitions, key_bnsc
+        key_codes.add(constraint.min_code)
+        key_codes.add(constraint.max_code)
+    for code in list(key_codes):
+        key_codes.add(complement_code(code))
+    key_codes.add(1)
+    key_codes.add(INFCODE)
+    key_codes = sorted(key_codes)
+    partitions = []
+    for index in range(0, len(key_codes), 2):
+        partitions.append(Constraint.from_codes(key_codes[index], key_codes[index+1]))
+    return partitions, [code_to_bn(code) for code in key_codes]
 
 def unintersect_intervals(uintervals):
     length = len(uintervals)
@@ -412,20 +402,20 @@ def lqsort(array, left, right):
 def lqsortpartition(array, left, right):
     temp = array[left]
     while left < right:
-        while left < right and array[right].min_bn > temp.min_bn:
+        while left < right and array[right].min_code > temp.min_code:
             right = right - 1
         array[left] = array[right]
-        while left < right and array[right].min_bn <= temp.min_bn:
+        while left < right and array[right].min_code <= temp.min_code:
             left = left + 1
         array[right] = array[left]
     array[left] = temp
     return left
 
 def lbsort(array):
-    for i in range(len(array)-1):
-        for j in range(len(array)-i-1):
-            if array[j].min_bn > array[j+1].min_bn:
-                array[j], array[j+1] = array[j+1], array[j]
+    """Sort the intervals by their left ends (stable).
+    """
+    array.sort(key=lambda c: c.min_code)
+
 def main():
     c1 = Constraint("[4,5]")
     c2 = Constraint("[0,0]")
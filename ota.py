@@ -3,7 +3,9 @@
 
 import sys
 import json
-from interval import Constraint, complement_intervals
+from bisect import bisect_right
+from collections import namedtuple
+from interval import Constraint, complement_intervals, point_codes
 
 class Location(object):
     """
@@ -125,6 +127,13 @@ class OTA(object):
         "trans" for the transitions list;
         "initstate_name" for the initial location name;
         "accept_names" fot the list of accepting locations.
+        The transitions are indexed by (source, action), see find_tran. The index
+        is rebuilt when "trans" is assigned or changes its length; after changing
+        the guards of the transitions in place, call build_tran_index.
+        "succ_table" for the successor table of the equivalence checks (see
+        equivalence.successor_table), dropped when "trans" is assigned;
+        "base_table" for the successor table of a previous version of the OTA and "changed"
+        for the names of the locations changed since, see hypothesis.HypothesisBuilder.
     """
     def __init__(self, name, sigma, locations, trans, init, accepts):
         self.name = name
@@ -134,6 +143,79 @@ class OTA(object):
         self.initstate_name = init
         self.accept_names = accepts or []
         self.sink_name = ""
+        self.base_table = None
+        self.changed = None
+
+    @property
+    def trans(self):
+        return self._trans
+
+    @trans.setter
+    def trans(self, trans):
+        self._trans = trans
+        self._tran_index = None
+        self._mq_trie = None
+        self.succ_table = None
+
+    def membership_trie(self):
+        """Return the membership query trie of the OTA, built on first use.
+        """
+        if self._mq_trie is None:
+            self._mq_trie = MembershipTrie(self)
+        return self._mq_trie
+
+    def build_tran_index(self):
+        """Index the transitions by (source, action). For each key, the guards are
+           sorted by their left ends so that the enabled transition is found by
+           bisection. If the guards of a key overlap, the key keeps its transitions
+           in order and is scanned instead.
+        """
+        groups = {}
+        for tran in self._trans:
+            key = (tran.source, tran.label)
+            if key not in groups:
+                groups[key] = []
+            groups[key].append(tran)
+        index = {}
+        for key, trans in groups.items():
+            guards = [(c.min_code, c.max_code, tran) for tran in trans for c in tran.constraints if not c.isEmpty()]
+            guards.sort(key=lambda x: x[0])
+            mins = [g[0] for g in guards]
+            maxs = [g[1] for g in guards]
+            if any(mins[i+1] <= maxs[i] for i in range(len(guards)-1)):
+                index[key] = (None, None, trans)
+            else:
+                index[key] = (mins, maxs, [g[2] for g in guards])
+        self._tran_index = index
+        self._tran_number = len(self._trans)
+
+    def find_tran(self, source, action, time, reset=None):
+        """Return the transition from the location "source" which is enabled by
+           the action at the clock value "time", or None. If "reset" is given, the
+           transition must also agree with it.
+        """
+        if self._tran_index is None or self._tran_number != len(self._trans):
+            self.build_tran_index()
+        entry = self._tran_index.get((source, action))
+        if entry is None:
+            return None
+        mins, maxs, trans = entry
+        if mins is None:
+            for tran in trans:
+                if reset is not None and tran.reset != reset:
+                    continue
+                for constraint in tran.constraints:
+                    if constraint.isininterval(time):
+                        return tran
+            return None
+        min_code, max_code = point_codes(time)
+        i = bisect_right(mins, min_code) - 1
+        if i < 0 or maxs[i] < max_code:
+            return None
+        tran = trans[i]
+        if reset is not None and tran.reset != reset:
+            return None
+        return tran
     
     def max_time_value(self):
         """
@@ -179,14 +261,10 @@ class OTA(object):
         else:
             current_statename = self.initstate_name
             for tw in tws:
-                flag = False
-                for tran in self.trans:
-                    if tran.source == current_statename and tran.is_pass(tw):
-                        current_statename = tran.target
-                        flag = True
-                        break
-                if flag == False:
+                tran = self.find_tran(current_statename, tw.action, tw.time)
+                if tran is None:
                     return -1
+                current_statename = tran.target
             if current_statename in self.accept_names:
                 return 1
             else:
@@ -238,20 +316,14 @@ class OTA(object):
                 if reset == False and tw.time < current_clock_valuation:
                     return self.sink_name
                 else:
-                    flag = False
-                    for tran in self.trans:
-                        if tran.source == current_statename and tran.is_pass_reset(tw):
-                            current_statename = tran.target
-                            current_clock_valuation = tw.time
-                            reset = tw.reset
-                            if reset == True:
-                                current_clock_valuation = 0
-                            flag = True
-                            break
-                    if flag == False:
+                    tran = self.find_tran(current_statename, tw.action, tw.time, tw.reset)
+                    if tran is None:
                         raise NotImplementedError("run_resettimedwords: an unhandle resettimedword!")
-                    else:
-                        pass
+                    current_statename = tran.target
+                    current_clock_valuation = tw.time
+                    reset = tw.reset
+                    if reset == True:
+                        current_clock_valuation = 0
             return current_statename
 
     def show(self):
@@ -273,17 +345,108 @@ class OTA(object):
         print("sink states: ")
         print(self.sink_name)
 
-class Timedword(object):
-    """The definition of timedword without resetting information.
+class MQNode(object):
     """
-    def __init__(self, action, time):
-        self.action = action
-        self.time = time
-    def __eq__(self, tw):
-        if self.action == tw.action and self.time == tw.time:
-            return True
+        The definition of the node in the membership query trie.
+        A node is the configuration reached by a reset-timed word:
+        "location" for the location name, "clock" for the clock valuation,
+        "reset" for the reset flag of the last letter;
+        "children" for the nodes reached by one more letter, keyed by (action, time).
+    """
+    __slots__ = ('location', 'clock', 'reset', 'children')
+    def __init__(self, location, clock, reset):
+        self.location = location
+        self.clock = clock
+        self.reset = reset
+        self.children = {}
+
+class MembershipTrie(object):
+    """
+        The memoization of the membership queries on a teacher OTA, shared by the
+        whole learning run. The teacher is deterministic, so the reset of a letter
+        is determined by the word before it and a child is keyed by (action, time).
+        The sink location is absorbing.
+        "hits" for the number of queries answered by the trie alone;
+        "misses" for the number of queries which ran at least one letter on the teacher;
+        "steps" for the number of letters run on the teacher.
+    """
+    def __init__(self, ota):
+        self.ota = ota
+        self.root = MQNode(ota.initstate_name, 0, True)
+        self.hits = 0
+        self.misses = 0
+        self.steps = 0
+
+    def step(self, node, action, time):
+        """Return the node reached from node by the timedword (action, time).
+        """
+        key = (action, time)
+        child = node.children.get(key)
+        if child is None:
+            child = self.__move(node, action, time)
+            node.children[key] = child
+        return child
+
+    def __move(self, node, action, time):
+        ota = self.ota
+        self.steps = self.steps + 1
+        if node.location == ota.sink_name or (node.reset == False and time < node.clock):
+            return MQNode(ota.sink_name, 0, True)
+        tran = ota.find_tran(node.location, action, time)
+        if tran is None:
+            raise NotImplementedError("MembershipTrie: an unhandle timedword "+Timedword(action,time).show())
+        if tran.reset == True:
+            return MQNode(tran.target, 0, True)
         else:
-            return False
+            return MQNode(tran.target, time, False)
+
+    def run(self, tws, node=None):
+        """Run the timedwords tws (the resets, if any, are not checked) from node,
+           the root by default, and return the reached node.
+        """
+        if node is None:
+            node = self.root
+        for tw in tws:
+            node = self.step(node, tw.action, tw.time)
+        return node
+
+    def query(self, tws, node=None):
+        """A membership query: same as run, and count a hit or a miss.
+        """
+        steps = self.steps
+        node = self.run(tws, node)
+        self.record(steps)
+        return node
+
+    def record(self, steps):
+        """Count a query which started when "steps" letters had been run on the teacher.
+        """
+        self.count(self.steps > steps)
+
+    def count(self, miss):
+        """Count a query as a miss or as a hit.
+        """
+        if miss == True:
+            self.misses = self.misses + 1
+        else:
+            self.hits = self.hits + 1
+
+    def value(self, node):
+        """1 for an accepting location, -1 for the sink location, 0 otherwise.
+        """
+        if node.location == self.ota.sink_name:
+            return -1
+        elif node.location in self.ota.accept_names:
+            return 1
+        else:
+            return 0
+
+class Timedword(namedtuple('Timedword', ['action', 'time'])):
+    """The definition of timedword without resetting information.
+       A timedword is an immutable tuple (action, time), so it is hashable and
+       compared in C. Timedwords are shared between the lists of timedwords.
+    """
+    __slots__ = ()
 
     def show(self):
         return '(' + self.action + ',' + str(self.time) + ')'
@@ -294,13 +457,11 @@ class Timedword(object):
     def __repr__(self):
         return self.show()
 
-class ResetTimedword(Timedword):
+class ResetTimedword(namedtuple('ResetTimedword', ['action', 'time', 'reset'])):
     """The definition of timedword with resetting information.
+       An immutable tuple (action, time, reset), see Timedword.
     """
-    def __init__(self, action, time, reset):
-        self.action = action
-        self.time = time
-        self.reset = reset
+    __slots__ = ()
     
     def resetflag(self):
         if self.reset == True:
@@ -310,12 +471,6 @@ class ResetTimedword(Timedword):
 
     def show(self):
         return '(' + self.action + ',' + str(self.time) + ',' + self.resetflag() + ')'
-    
-    def __eq__(self, rtw):
-        if self.action == rtw.action and self.time == rtw.time and self.reset == rtw.reset:
-            return True
-        else:
-            return False
 
     def __str__(self):
         return self.show()
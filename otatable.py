@@ -2,14 +2,35 @@
 
 import copy
 from ota import Timedword, ResetTimedword, is_valid_rtws, dRTWs_to_lRTWs
+from verbosity import log, TABLE
 #from fa import *
 
 class Element(object):
     """The definition of the element in OTA observation table.
+       The node of the membership trie reached by tws is cached on the element,
+       so that filling a new column only runs the column from it.
     """
     def __init__(self, tws=[], value=[]):
         self.tws = tws or []
         self.value = value or []
+        self._trie = None
+        self._node = None
+
+    def __getstate__(self):
+        # a copy recomputes its end node, rather than copying the trie
+        state = self.__dict__.copy()
+        state['_trie'] = None
+        state['_node'] = None
+        return state
+
+    def end_node(self, trie):
+        """Return the node of the membership trie reached by tws (the end location,
+           clock valuation and reset flag), running tws only once per trie.
+        """
+        if self._trie is not trie:
+            self._node = trie.run(self.tws)
+            self._trie = trie
+        return self._node
     
     def __eq__(self, element):
         if self.tws == element.tws and self.value == element.value:
@@ -18,13 +39,7 @@ class Element(object):
             return False
 
     def get_tws_e(self, e):
-        tws_e = [tw for tw in self.tws]
-        if len(e) == 0:
-            return tws_e
-        else:
-            for tw in e:
-                tws_e.append(tw)
-            return tws_e
+        return self.tws + list(e)
 
     def row(self):
         return self.value
@@ -38,6 +53,96 @@ class Element(object):
     def show(self):
         return [tw.show() for tw in self.tws], self.value
 
+class ColumnNode(object):
+    """The definition of the node in the column trie.
+       "children" for the nodes reached by one more timedword, keyed by (action, time);
+       "ends" for the indices of the suffixes in E ending at the node;
+       "last" for the largest index of a suffix ending in the subtree.
+    """
+    __slots__ = ('children', 'ends', 'last')
+    def __init__(self):
+        self.children = {}
+        self.ends = []
+        self.last = -1
+
+class ColumnTrie(object):
+    """The suffixes of E in a trie, so that the columns of a row are evaluated by one
+       depth-first walk which runs each common prefix of the suffixes only once.
+    """
+    def __init__(self, E):
+        self.root = ColumnNode()
+        for i in range(0, len(E)):
+            self.add(i, E[i])
+
+    def add(self, index, e):
+        node = self.root
+        node.last = index
+        for tw in e:
+            key = (tw.action, tw.time)
+            child = node.children.get(key)
+            if child is None:
+                child = ColumnNode()
+                node.children[key] = child
+            child.last = index
+            node = child
+        node.ends.append(index)
+
+    def evaluate(self, trie, node, start):
+        """Run the suffixes with the indices from start on the membership trie from
+           its node, and return their values in the order of E.
+        """
+        values = {}
+        sink_name = trie.ota.sink_name
+        stack = [(self.root, node, False)]
+        while len(stack) > 0:
+            column_node, node, miss = stack.pop()
+            if node.location == sink_name:
+                # the sink location is absorbing
+                for column in self.__subtree(column_node, start):
+                    values[column] = -1
+                    trie.count(miss)
+                continue
+            for column in column_node.ends:
+                if column >= start:
+                    values[column] = trie.value(node)
+                    trie.count(miss)
+                    # the same suffix again is answered by the trie
+                    miss = False
+            for (action, time), child in column_node.children.items():
+                if child.last >= start:
+                    steps = trie.steps
+                    child_node = trie.step(node, action, time)
+                    stack.append((child, child_node, miss or trie.steps > steps))
+        return [values[i] for i in sorted(values)]
+
+    def __subtree(self, column_node, start):
+        columns = []
+        stack = [column_node]
+        while len(stack) > 0:
+            column_node = stack.pop()
+            columns.extend([column for column in column_node.ends if column >= start])
+            stack.extend([child for child in column_node.children.values() if child.last >= start])
+        return columns
+
+class Defects(object):
+    """The defects of an OTA observation table found by OTATable.analyze.
+       "move" for the elements to move from R to S, "new_S" and "new_R" for S and R after moving;
+       "inconsistencies" for the pairs (new_a, new_e_index), one for each new column;
+       "new_added" for the new elements which make the table evidence-closed.
+    """
+    def __init__(self, new_S, new_R, move, inconsistencies, new_added):
+        self.new_S = new_S
+        self.new_R = new_R
+        self.move = move
+        self.inconsistencies = inconsistencies
+        self.new_added = new_added
+
+    def prepared(self):
+        if len(self.move) == 0 and len(self.inconsistencies) == 0 and len(self.new_added) == 0:
+            return True
+        else:
+            return False
+
 class OTATable(object):
     """The definition of OTA observation table.
     """
@@ -45,16 +150,36 @@ class OTATable(object):
         self.S = S
         self.R = R
         self.E = E #if E is empty, it means that there is an empty action in E.
+        self._tws_keys = None
+        self._column_trie = None
+
+    def column_trie(self):
+        """Return the column trie of E, built once per table.
+        """
+        if self._column_trie is None:
+            self._column_trie = ColumnTrie(self.E)
+        return self._column_trie
+
+    def tws_keys(self):
+        """Return the set of the keys (tws_key) of the timedwords in S U R.
+           The set is built once per table, so the keys of the elements appended
+           to S or R afterwards must be added to it.
+        """
+        if self._tws_keys is None:
+            self._tws_keys = set(tws_key(e.tws) for e in self.S + self.R)
+        return self._tws_keys
     
     def is_prepared(self, ota):
+        return self.analyze(ota).prepared()
+
+    def analyze(self, ota):
+        """Find all the defects of the table in one pass: the elements to move
+           from R to S, every inconsistency and the new elements for evidence-closure.
+        """
         flag_closed, new_S, new_R, move = self.is_closed()
-        flag_consistent, new_a, new_e_index = self.is_consistent()
+        inconsistencies = self.inconsistencies()
         flag_evid_closed, new_added = self.is_evidence_closed(ota)
-        #if flag_closed == True and flag_consistent == True: #and flag_evid_closed == True:
-        if flag_closed == True and flag_consistent == True and flag_evid_closed == True:
-            return True
-        else:
-            return False
+        return Defects(new_S, new_R, move, inconsistencies, new_added)
 
     def is_closed(self):
         """ 1. determine whether the table is closed.
@@ -65,20 +190,15 @@ class OTATable(object):
         """
         new_S = [s for s in self.S]
         new_R = [r for r in self.R]
-        new_S_rows = [s.row() for s in new_S]
+        new_S_rows = set(row_key(s) for s in new_S)
         move = []
         for r in self.R:
-            flag = False
-            for s in self.S:
-                if r.row() == s.row():
-                    flag = True
-                    break
-            if flag == False:
-                if r.row() not in new_S_rows:
-                    new_S.append(r)
-                    new_R.remove(r)
-                    move.append(r)
-                    new_S_rows = [s.row() for s in new_S]
+            key = row_key(r)
+            if key not in new_S_rows:
+                new_S.append(r)
+                new_R.remove(r)
+                move.append(r)
+                new_S_rows.add(key)
         if len(new_S) > len(self.S):
             return False, new_S, new_R, move
         else:
@@ -88,86 +208,124 @@ class OTATable(object):
         """Determine whether the table is consistent.
             (if tws1,tws2 in S U R, if a in sigma* tws1+a, tws2+a in S U R and row(tws1) = row(tws2), 
             then row(tws1+a) = row(tws2+a))
+            Return the first inconsistency found.
+        """
+        for new_a, new_e_index in self.__inconsistencies():
+            return False, new_a, new_e_index
+        return True, None, None
+
+    def inconsistencies(self):
+        """Return all the inconsistencies of the table as a list of (new_a, new_e_index),
+           one for each new column they require.
+        """
+        result = []
+        columns = set()
+        for new_a, new_e_index in self.__inconsistencies():
+            column = (new_a[0].action, new_a[0].time, new_e_index)
+            if column not in columns:
+                columns.add(column)
+                result.append((new_a, new_e_index))
+        return result
+
+    def __inconsistencies(self):
+        """Generate the inconsistencies in table order. Only the pairs in the same
+           bucket of the row index are compared, and only their one-letter extensions
+           from the children index.
         """
-        flag = True
-        new_a = None
-        new_e_index = None
         table_element = [s for s in self.S] + [r for r in self.R]
-        for i in range(0, len(table_element)-1):
-            for j in range(i+1, len(table_element)):
-                if table_element[i].row() == table_element[j].row():
-                    temp_elements1 = []
-                    temp_elements2 = []
-                    #print len(table_element[2].tws), [tw.show() for tw in table_element[2].tws]
-                    for element in table_element:
-                        #print "element", [tw.show() for tw in element.tws]
-                        if is_prefix(element.tws, table_element[i].tws):
-                            new_element1 = Element(delete_prefix(element.tws, table_element[i].tws), [v for v in element.value])
-                            temp_elements1.append(new_element1)
-                        if is_prefix(element.tws, table_element[j].tws):
-                            #print "e2", [tw.show() for tw in element.tws]
-                            new_element2 = Element(delete_prefix(element.tws, table_element[j].tws), [v for v in element.value])
-                            temp_elements2.append(new_element2)
-                    for e1 in temp_elements1:
-                        for e2 in temp_elements2:
-                            #print [tw.show() for tw in e1.tws], [tw.show() for tw in e2.tws]
-                            #if len(e1.tws) == 1 and len(e2.tws) == 1 and e1.tws == e2.tws:
-                            if len(e1.tws) == 1 and len(e2.tws) == 1 and e1.tws[0].action == e2.tws[0].action and e1.tws[0].time == e2.tws[0].time:
-                                if e1.row() == e2.row():
-                                    pass
-                                else:
-                                    flag = False
-                                    new_a = e1.tws
-                                    for i in range(0, len(e1.value)):
-                                        if e1.value[i] != e2.value[i]:
-                                            new_e_index = i
-                                            return flag, new_a, new_e_index
-        return flag, new_a, new_e_index
+        rows = self.rows_index()
+        children = self.children_index()
+        position = {}
+        for element1 in table_element:
+            key = row_key(element1)
+            bucket = rows[key]
+            index = position.get(key, 0)
+            position[key] = index + 1
+            if len(bucket) < 2:
+                continue
+            children1 = children.get(tws_key(element1.tws), [])
+            if len(children1) == 0:
+                continue
+            # the later elements with the same row, in table order
+            for element2 in bucket[index+1:]:
+                children2 = {}
+                for child in children.get(tws_key(element2.tws), []):
+                    a = (child.tws[-1].action, child.tws[-1].time)
+                    if a not in children2:
+                        children2[a] = []
+                    children2[a].append(child)
+                for child1 in children1:
+                    for child2 in children2.get((child1.tws[-1].action, child1.tws[-1].time), []):
+                        if child1.value != child2.value:
+                            new_a = child1.tws[-1:]
+                            for i in range(0, len(child1.value)):
+                                if child1.value[i] != child2.value[i]:
+                                    yield new_a, i
+                                    break
+
+    def rows_index(self):
+        """Return a dict from the rows (as tuples) to the elements of S U R having
+           them, in table order.
+        """
+        rows = {}
+        for element in self.S + self.R:
+            key = row_key(element)
+            if key not in rows:
+                rows[key] = []
+            rows[key].append(element)
+        return rows
+
+    def children_index(self):
+        """Return a dict from the timedwords (as tws_key) to the elements of S U R
+           which extend them by one letter, in table order.
+        """
+        children = {}
+        for element in self.S + self.R:
+            if len(element.tws) == 0:
+                continue
+            key = tws_key(element.tws[:-1])
+            if key not in children:
+                children[key] = []
+            children[key].append(element)
+        return children
     
     def is_evidence_closed(self, ota):
         """Determine whether the table is evidence-closed.
         """
         flag = True
-        table_tws = [s.tws for s in self.S] + [r.tws for r in self.R]
+        table_tws = set(self.tws_keys())
         new_added = []
+        trie = ota.membership_trie()
         for s in self.S:
             #local_s = dRTWs_to_lRTWs(s.tws)
             local_s = s.tws
-            current_location_name = ota.run_resettimedwords(local_s)
+            s_node = s.end_node(trie)
             for e in self.E:
                 temp_e = []
-                current_location = copy.deepcopy(current_location_name)
+                node = s_node
+                steps = trie.steps
                 reset = True
                 clock_valuation = 0
                 if len(s.tws) > 0:
                     reset = local_s[len(local_s)-1].reset
                     clock_valuation = local_s[len(local_s)-1].time
                 for tw in e:
-                    new_timedword = Timedword(tw.action,tw.time)
-                    if reset == False and new_timedword.time < clock_valuation:
+                    if reset == False and tw.time < clock_valuation:
                         temp_e.append(ResetTimedword(tw.action,tw.time,True))
-                        current_location = ota.sink_name
-                        clock_valuation = 0
                         break
                     else:
-                        for otatran in ota.trans:
-                            if otatran.source == current_location and otatran.is_pass(new_timedword):
-                                new_resettimedword = ResetTimedword(tw.action,tw.time,otatran.reset)
-                                temp_e.append(new_resettimedword)
-                                clock_valuation = new_timedword.time
-                                reset = otatran.reset
-                                if reset == True:
-                                    clock_valuation = 0
-                                current_location = otatran.target
-                                break
+                        node = trie.step(node, tw.action, tw.time)
+                        temp_e.append(ResetTimedword(tw.action,tw.time,node.reset))
+                        reset = node.reset
+                        clock_valuation = node.clock
+                trie.record(steps)
                 temp_se = [rtw for rtw in s.tws] + [rtw for rtw in temp_e]
-                prefs = prefixes(temp_se)
-                for pref in prefs:
-                    if pref not in table_tws:
-                        table_tws.append(pref)
-                        #table_tws = [tws for tws in table_tws] + [pref]
-                        new_tws = [tws for tws in pref]
-                        new_element = Element(new_tws,[])
+                temp_se_key = tws_key(temp_se)
+                for i in range(1, len(temp_se)+1):
+                    pref_key = temp_se_key[:i]
+                    if pref_key not in table_tws:
+                        table_tws.add(pref_key)
+                        new_element = Element(temp_se[:i],[])
                         new_added.append(new_element)
         if len(new_added) > 0:
             flag = False
@@ -190,48 +348,73 @@ def make_closed(new_S, new_R, move, table, sigma, ota):
     #flag, new_S, new_R, move = table.is_closed()
     new_E = table.E
     closed_table = OTATable(new_S, new_R, new_E)
-    table_tws = [s.tws for s in closed_table.S] + [r.tws for r in closed_table.R]
+    table_tws = closed_table.tws_keys()
     for s in move:
         s_tws = [tw for tw in s.tws]
         for action in sigma:
             #new_tw = get_TW_delay_zero(s_tws, action, ota)
             new_tw, value = new_rtw_in_closed(s_tws,action,ota)
             temp_tws = s_tws+[new_tw]
-            if temp_tws not in table_tws:
+            temp_key = tws_key(temp_tws)
+            if temp_key not in table_tws:
                 temp_element = Element(temp_tws,[value])
-                fill(temp_element, closed_table.E, ota)
+                fill(temp_element, closed_table.E, ota, closed_table.column_trie())
                 closed_table.R.append(temp_element)
-                table_tws = [s.tws for s in closed_table.S] + [r.tws for r in closed_table.R]
+                table_tws.add(temp_key)
     return closed_table
 
 def make_consistent(new_a, new_e_index, table, sigma, ota):
     #flag, new_a, new_e_index = table.is_consistent()
     #print flag
+    return make_consistent_all([(new_a, new_e_index)], table, sigma, ota)
+
+def make_consistent_all(inconsistencies, table, sigma, ota):
+    """Add the new column of every inconsistency (new_a, new_e_index) to E at once.
+    """
     new_E = [tws for tws in table.E]
     #new_E = copy.deepcopy(table.E)
-    new_e = [Timedword(tw.action,tw.time) for tw in new_a]
-    if new_e_index > 0:
-        e = table.E[new_e_index-1]
-        new_e.extend(e)
-    new_E.append(new_e)
+    for new_a, new_e_index in inconsistencies:
+        new_e = [Timedword(tw.action,tw.time) for tw in new_a]
+        if new_e_index > 0:
+            e = table.E[new_e_index-1]
+            new_e.extend(e)
+        new_E.append(new_e)
     new_S = [s for s in table.S]
     new_R = [r for r in table.R]
+    consistent_table = OTATable(new_S, new_R, new_E)
+    columns = None
+    if len(inconsistencies) > 1:
+        columns = consistent_table.column_trie()
     for i in range(0, len(new_S)):
-        fill(new_S[i], new_E, ota)
+        fill(new_S[i], new_E, ota, columns)
     for j in range(0, len(new_R)):
-        fill(new_R[j], new_E, ota)
-    consistent_table = OTATable(new_S, new_R, new_E)
+        fill(new_R[j], new_E, ota, columns)
     return consistent_table
 
 def make_evidence_closed(new_added, table, sigma, ota):
     for i in range(0,len(new_added)):
-        fill(new_added[i], table.E, ota)
+        fill(new_added[i], table.E, ota, table.column_trie())
     new_E = [e for e in table.E]
     new_R = [r for r in table.R] + [nr for nr in new_added]
     new_S = [s for s in table.S]
     evidence_closed_table = OTATable(new_S, new_R, new_E)
     return evidence_closed_table
 
+def make_prepared(defects, table, sigma, ota):
+    """Repair all the defects found by one analysis of the table at once: add the
+       new columns, then move the elements from R to S, then add the new elements
+       for evidence-closure which are not in the table yet.
+    """
+    if len(defects.inconsistencies) > 0:
+        table = make_consistent_all(defects.inconsistencies, table, sigma, ota)
+    if len(defects.move) > 0:
+        table = make_closed(defects.new_S, defects.new_R, defects.move, table, sigma, ota)
+    if len(defects.new_added) > 0:
+        table_tws = table.tws_keys()
+        new_added = [e for e in defects.new_added if tws_key(e.tws) not in table_tws]
+        table = make_evidence_closed(new_added, table, sigma, ota)
+    return table
+
 def get_TW_delay_zero(tws, action, ota):
     """When move a timedwords tws from R to S, generate the new delay timedwords with reset information with delay 0.
     """
@@ -244,19 +427,20 @@ def get_TW_delay_zero(tws, action, ota):
         new_timedword = Timedword(action,0)
     source_location_name = ota.run_resettimedwords(local_tws)
     new_resettimedword = None
-    for otatran in ota.trans:
-        if otatran.source == source_location_name and otatran.is_pass(new_timedword):
-            new_resettimedword = ResetTimedword(action,new_timedword.time,otatran.reset)
-            # return the delay timed words with reset information
-            #new_resettimedword = ResetTimedword(action,0,otatran.reset)
-            break
+    otatran = ota.find_tran(source_location_name, action, new_timedword.time)
+    if otatran is not None:
+        new_resettimedword = ResetTimedword(action,new_timedword.time,otatran.reset)
+        # return the delay timed words with reset information
+        #new_resettimedword = ResetTimedword(action,0,otatran.reset)
     return new_resettimedword
 
 def new_rtw_in_closed(tws, action, ota):
     if is_valid_rtws(tws) == False:
         return ResetTimedword(action,0,True), -1
     else:
-        current_statename = ota.run_resettimedwords(tws)
+        trie = ota.membership_trie()
+        node = trie.run(tws)
+        current_statename = node.location
         current_clock_valuation = 0
         reset = True
         if len(tws) > 0:
@@ -267,71 +451,32 @@ def new_rtw_in_closed(tws, action, ota):
         if reset == False and current_clock_valuation > 0:
             return ResetTimedword(action,0,True), -1
         else:
-            flag = False
-            for tran in ota.trans:
-                if tran.source == current_statename and tran.is_pass(Timedword(action,0)):
-                    flag = True
-                    current_statename = tran.target
-                    new_rtw = ResetTimedword(action,0,tran.reset)
-                    if current_statename == ota.sink_name:
-                        return new_rtw, -1
-                    elif current_statename in ota.accept_names:
-                        return new_rtw, 1
-                    else:
-                        return new_rtw, 0
-            if flag == False:
-                raise NotImplementedError("new_rtw_in_closed: an unhandle timedword "+Timedword(action,0).show())
+            node = trie.query([Timedword(action,0)], node)
+            new_rtw = ResetTimedword(action,0,node.reset)
+            return new_rtw, trie.value(node)
 
-def fill(element, E, ota):
+def fill(element, E, ota, columns=None):
     """Fill an element in S U R.
+       If the column trie "columns" of E is given, the new columns are evaluated by
+       one walk of it.
     """
     #local_tws = dRTWs_to_lRTWs(element.tws)
-    local_tws = element.tws
-    current_location_name = ota.run_resettimedwords(local_tws)
+    trie = ota.membership_trie()
     if len(element.value) == 0:
-        f = ota.is_accepted_reset(local_tws)
-        element.value.append(f)
-    if current_location_name == ota.sink_name:
+        steps = trie.steps
+        node = element.end_node(trie)
+        trie.record(steps)
+        element.value.append(trie.value(node))
+    else:
+        node = element.end_node(trie)
+    if node.location == ota.sink_name:
         for i in range(len(element.value)-1, len(E)):
             element.value.append(-1)
+    elif columns is not None:
+        element.value.extend(columns.evaluate(trie, node, len(element.value)-1))
     else:
         for i in range(len(element.value)-1, len(E)):
-            current_location = copy.deepcopy(current_location_name)
-            reset = True
-            clock_valuation = 0
-            if len(element.tws) > 0:
-                reset = local_tws[len(local_tws)-1].reset
-                clock_valuation = local_tws[len(local_tws)-1].time
-                if reset == True:
-                    clock_valuation = 0
-            for tw in E[i]:
-                if reset == False and tw.time < clock_valuation:
-                    #element.value.append(-1)
-                    current_location = ota.sink_name
-                    clock_valuation = 0
-                    reset = True
-                    break
-                else:
-                    flag = False
-                    for otatran in ota.trans:
-                        if otatran.source == current_location and otatran.is_pass(tw):
-                            reset = otatran.reset
-                            clock_valuation = tw.time
-                            if reset == True:
-                                clock_valuation = 0
-                            current_location = otatran.target
-                            flag = True
-                            break
-                    if flag == False:
-                        raise NotImplementedError("fill")
-                    else:
-                        pass
-            if current_location in ota.accept_names:
-                element.value.append(1)
-            elif current_location == ota.sink_name:
-                element.value.append(-1)
-            else:
-                element.value.append(0)
+            element.value.append(trie.value(trie.query(E[i], node)))
 
 # def fill(element, E, ota):
 #     if len(element.value) == 0:
@@ -344,6 +489,17 @@ def fill(element, E, ota):
 #         element.value.append(f)
 
 
+def tws_key(tws):
+    """Return a hashable key of the reset-timedwords tws, the tuple of its
+       (action, time, reset) timedwords.
+    """
+    return tuple(tws)
+
+def row_key(element):
+    """Return a hashable key of the row of the element.
+    """
+    return tuple(element.value)
+
 def prefixes(tws):
     """Return the prefixes of a timedwords. [tws1, tws2, tws3, ..., twsn]
     """
@@ -356,34 +512,21 @@ def prefixes(tws):
 def is_prefix(tws, pref):
     """Determine whether the pref is a prefix of the timedwords tws
     """
-    if len(pref) == 0:
-        return True
-    else:
-        if len(tws) < len(pref):
-            return False
-        else:
-            for i in range(0, len(pref)):
-                if tws[i] == pref[i]:
-                    pass
-                else:
-                    return False
-            return True
+    return tws[:len(pref)] == pref
 
 def delete_prefix(tws, pref):
     """Delete a prefix of timedwords tws, and return the new tws
     """
-    if len(pref) == 0:
-        return [tw for tw in tws]
-    else:
-        new_tws = tws[len(pref):]
-        return new_tws
+    return tws[len(pref):]
 
 def fix_resets(ctx, ota):
     #print(ctx)
     new_tws = [Timedword(rtw.action,rtw.time) for rtw in ctx]
     #print(new_tws)
     dRTWs = []
-    current_location = ota.initstate_name
+    trie = ota.membership_trie()
+    steps = trie.steps
+    node = trie.root
     current_clock_valuation = 0
     reset = True
     for tw in new_tws:
@@ -391,12 +534,10 @@ def fix_resets(ctx, ota):
             current_clock_valuation = current_clock_valuation + tw.time
         else:
             current_clock_valuation = tw.time
-        for tran in ota.trans:
-            if tran.source == current_location and tran.is_pass(Timedword(tw.action,current_clock_valuation)):
-                dRTWs.append(ResetTimedword(tw.action,tw.time,tran.reset))
-                current_location = tran.target
-                reset = tran.reset
-                break
+        node = trie.step(node, tw.action, current_clock_valuation)
+        dRTWs.append(ResetTimedword(tw.action,tw.time,node.reset))
+        reset = node.reset
+    trie.record(steps)
     return dRTWs
 
 def add_ctx(ctx, table, ota):
@@ -406,45 +547,39 @@ def add_ctx(ctx, table, ota):
     #print(fix_resets(ctx,ota))
     local_tws = dRTWs_to_lRTWs(fix_resets(ctx,ota))
     normalize(local_tws)
-    print(local_tws)
+    log(TABLE, "%s", local_tws)
     #local_tws = dRTWs_to_lRTWs(ctx)
     pref = prefixes(local_tws)
-    S_tws = [s.tws for s in table.S]
-    S_R_tws = [s.tws for s in table.S] + [r.tws for r in table.R]
+    S_R_tws = table.tws_keys()
     new_S = [s for s in table.S]
     new_R = [r for r in table.R]
     new_E = [e for e in table.E]
     for tws in pref:
-        need_add = True
-        for stws in S_R_tws:
-        #for stws in S_tws:
-            #if tws_equal(tws, stws):
-            if tws == stws:
-                need_add = False
-                break
+        need_add = tws_key(tws) not in S_R_tws
         if need_add == True:
             temp_element = Element(tws,[])
-            fill(temp_element, new_E, ota)
+            fill(temp_element, new_E, ota, table.column_trie())
             new_R.append(temp_element)
     return OTATable(new_S, new_R, new_E)
 
 def normalize(tws):
-    """Normalize the ctx.
+    """Normalize the ctx (in place, the timedwords themselves are immutable).
     """
-    for rtw in tws:
+    for i, rtw in enumerate(tws):
         if isinstance(rtw.time, int) == True:
             pass
         else:
             integer, frac = str(rtw.time).split('.')
             if frac == '0':
-                rtw.time = int(integer)
+                tws[i] = rtw._replace(time=int(integer))
             else:
-                rtw.time = float(integer + '.1')
+                tws[i] = rtw._replace(time=float(integer + '.1'))
 
 def init_table(sigma, ota):
     S = [Element([],[])]
     R = []
     E = []
+    trie = ota.membership_trie()
     for s in S:
         if ota.initstate_name in ota.accept_names:
             s.value.append(1)
@@ -452,19 +587,9 @@ def init_table(sigma, ota):
             s.value.append(0)
     for action in sigma:
         new_tw = Timedword(action, 0)
-        new_element = None
-        for tran in ota.trans:
-            if tran.source == ota.initstate_name and tran.is_pass(new_tw):
-                new_rtw = ResetTimedword(new_tw.action,new_tw.time,tran.reset)
-                new_value = []
-                if tran.target in ota.accept_names:
-                    new_value = [1]
-                elif tran.target == ota.sink_name:
-                    new_value = [-1]
-                else:
-                    new_value = [0]
-                new_element = Element([new_rtw], new_value)
-                R.append(new_element)
-                break
+        node = trie.query([new_tw])
+        new_rtw = ResetTimedword(new_tw.action,new_tw.time,node.reset)
+        new_element = Element([new_rtw], [trie.value(node)])
+        R.append(new_element)
     T = OTATable(S, R, E)
     return T
\ No newline at end of file
@@ -54,6 +54,60 @@ class EquivalenceTest(unittest.TestCase):
         self.assertEqual(regions[1].show(), "(0,1)")
         self.assertEqual(regions[9].show(), "(4,+)")
         
+    def testRegionNumbers(self):
+        rs = Regions(max_time_value)
+        self.assertEqual(rs.last, 9)
+        self.assertEqual([rs.next[r] for r in [0, 5, 8, 9]], [1, 6, 9, 9])
+        self.assertEqual([rs.ispoint[r] for r in [0, 5, 8, 9]], [True, False, True, False])
+        self.assertEqual([rs.region(r) for r in regions], list(range(10)))
+        self.assertEqual(rs.guard_range(Constraint("[1,3)")), (2, 5))
+        self.assertEqual(rs.guard_range(Constraint("(2,+)")), (5, 9))
+        self.assertEqual(rs.guard_range(Constraint("[1,1]")), (2, 2))
+
+    def testSuccessorTable(self):
+        A, _ = buildOTA('a.json', 's')
+        AA = buildAssistantOTA(A, 's')
+        table = successor_table(AA, Regions(max_time_value))
+        self.assertIs(successor_table(AA, Regions(max_time_value)), table)
+        self.assertEqual(table.letter_asucc(('s', "1", 2), 'a'), ('s', "2", 2))
+        self.assertEqual(table.letter_asucc(('s', "2", 4), 'b'), ('s', "3", 0))
+        self.assertEqual(table.letter_asucc(('s', "1", 2), 'a'), ('s', "2", 2))
+        self.assertEqual(len(table.succ), 2)
+        ota_inclusion(max_time_value, AA, CC)
+        self.assertIs(AA.succ_table, table)
+        self.assertIsNot(successor_table(AA, Regions(max_time_value+1)), table)
+        AA.trans = [tran for tran in AA.trans]
+        self.assertEqual(AA.succ_table, None)
+
+    def testTeacherTable(self):
+        A, _ = buildOTA('a.json', 's')
+        AA = buildAssistantOTA(A, 's')
+        ota_equivalence(max_time_value, CC, AA)
+        table = AA.succ_table
+        self.assertEqual(len(table.reachable), 28)
+        self.assertEqual(len(table.moves), 28)
+        self.assertEqual(table.letter_moves(('s', "1", 2)), [('a', ('s', "2", 2)), ('b', ('s', "4", 0))])
+        self.assertEqual(table.letter_delay(('s', "3", 4)), ('s', "3", 5))
+        self.assertEqual(table.letter_delay(('s', "3", 5)), ('s', "3", 5))
+        ota_equivalence(max_time_value, BB, AA)
+        self.assertIs(AA.succ_table, table)
+        self.assertEqual(len(table.moves), 28)
+
+    def testLiveLocations(self):
+        self.assertEqual(live_locations(AA), set(["1", "2", "3"]))
+        self.assertEqual(live_locations(A), set(["1", "2", "3"]))
+        stats = InclusionStats()
+        self.assertEqual(ota_equivalence(max_time_value, AA, CC, stats), (True, None))
+        self.assertTrue(stats.dead > 0)
+
+    def testLocationMaxConstants(self):
+        # the constant 4 of location 2 is propagated to location 1 by the transition without a reset
+        self.assertEqual(location_max_constants(AA), {"1": 4, "2": 4, "3": 2, "4": 0})
+        product = Product(max_time_value, AA, BB)
+        self.assertEqual((product.last[('s', "3")], product.last[('s', "4")], product.last[('q', "1")]), (5, 1, 9))
+        self.assertEqual(product.delay_succ((frozenset([('s', "4", 1), ('q', "1", 7)]),)), [(frozenset([('s', "4", 1), ('q', "1", 7)]),), (frozenset([('s', "4", 1), ('q', "1", 8)]),), (frozenset([('s', "4", 1), ('q', "1", 9)]),)])
+        self.assertEqual(Product(max_time_value, AA, BB, False).last[('s', "4")], 9)
+
     def testLetters(self):
         self.assertEqual(letter1.show(), "s_1,[0,0]")
         self.assertEqual(letter2.show(), "s_1,(0,1)")
@@ -93,6 +147,30 @@ class EquivalenceTest(unittest.TestCase):
         self.assertEqual(letterword2, res)
         self.assertEqual(letterword_dominated(Letterword(letterword2),Letterword(letterword)), True)
 
+    def testLetterwordKey(self):
+        lw1 = Letterword([{Letter(L1, "[0,0]"), Letter(Q1, "[0,0]")}], None, '')
+        lw2 = Letterword([{Letter(Q1, "[0,0]"), Letter(L1, "[0,0]")}], lw1, 'a')
+        lw3 = Letterword([{Letter(L1, "[0,0]")}, {Letter(Q1, "(0,1)")}])
+        self.assertEqual(lw1.key(), lw2.key())
+        self.assertEqual(len(set([lw1, lw2, lw3])), 2)
+        self.assertEqual(lw3.key(), (frozenset([('s', "1", 1, 2)]), frozenset([('q', "1", 3, 4)])))
+
+    def testAntichain(self):
+        lw1 = Letterword([{Letter(L1, "[0,0]")}, {Letter(Q1, "(0,1)")}])
+        lw2 = Letterword([{Letter(L1, "[0,0]"), Letter(L2, "[1,1]")}, {Letter(Q1, "(0,1)")}])
+        lw3 = Letterword([{Letter(L1, "[0,0]"), Letter(Q1, "(0,1)")}])
+        self.assertEqual(key_dominated(lw1.key(), lw2.key()), True)
+        self.assertEqual(key_dominated(lw3.key(), lw1.key()), False)
+        explored = Antichain()
+        explored.add(lw1.key())
+        self.assertEqual(explored.dominated(lw1.key()), True)
+        self.assertEqual(explored.dominated(lw3.key()), False)
+        explored.add(lw3.key())
+        self.assertEqual((explored.stats.explored, explored.stats.pruned, explored.stats.evicted), (2, 1, 0))
+        stats = InclusionStats()
+        self.assertEqual(ota_inclusion(max_time_value, AA, CC, stats)[0], True)
+        self.assertTrue(stats.explored > 0)
+
     def testNextRegion(self):
         test_data = [
             (regions[2], regions[3]),
@@ -296,6 +374,32 @@ class EquivalenceTest(unittest.TestCase):
         self.assertEqual(ota_inclusion(max_time_value, AA, c_ota1)[0], True)
         self.assertEqual(ota_inclusion(max_time_value, c_ota1, AA)[0], False)
     
+    def testOTAEquivalence(self):
+        self.assertEqual(ota_equivalence(max_time_value, AA, CC), (True, None))
+        self.assertEqual(ota_equivalence(max_time_value, AA, DD)[0], False)
+        # the shortest counterexample, though a longer positive one exists
+        flag, ctx = equivalence_query(max_time_value, AA, BB)
+        self.assertEqual((flag, ctx.tws, ctx.value), (False, [ResetTimedword('a',1.1,False)], [0]))
+        flag, ctx = equivalence_query(max_time_value, AA, DD)
+        self.assertEqual((flag, ctx.tws, ctx.value), (False, [ResetTimedword('a',1,False), ResetTimedword('b',1,True), ResetTimedword('b',1,True)], [0]))
+
+    def testReached(self):
+        reached = Reached("w0")
+        self.assertEqual(reached.add("w1", "w0", 'a'), True)
+        self.assertEqual(reached.add("w2", "w1", 'b'), True)
+        self.assertEqual(reached.add("w1", "w2", 'a'), False)
+        self.assertEqual((reached.depth("w2"), reached.parents), (2, [-1, 0, 1]))
+        self.assertEqual(reached.path("w2"), [("w1", 'a'), ("w2", 'b')])
+        self.assertEqual(reached.path("w0"), [])
+
+    def testZoneEquivalence(self):
+        self.assertEqual(zone_equivalence(AA, CC), (True, None))
+        self.assertEqual(zone_inclusion(AA, DD)[0], False)
+        flag, ctx = equivalence_query(max_time_value, AA, BB, symbolic=True)
+        self.assertEqual((flag, ctx.tws, ctx.value), (False, [ResetTimedword('a',2,False)], [0]))
+        flag, ctx = equivalence_query(max_time_value, AA, DD, symbolic=True)
+        self.assertEqual((flag, ctx.tws, ctx.value), (False, [ResetTimedword('a',1,False), ResetTimedword('b',1,True), ResetTimedword('b',1,True)], [0]))
+
     def testFindDelayTimedwords(self):
         ota1, _ = buildOTA('test.json', 'q')
         c_ota1 = buildAssistantOTA(ota1, 'q')
@@ -0,0 +1,59 @@
+#Unit tests for interval.py
+
+import unittest
+import sys
+sys.path.append('../')
+from interval import *
+
+class IntervalTest(unittest.TestCase):
+    def testCodes(self):
+        c = Constraint("(3,+)")
+        self.assertEqual(c.min_code, lower_code('3', False))
+        self.assertEqual(c.max_code, INFCODE)
+        self.assertEqual(c.min_value, '3')
+        self.assertEqual(c.max_value, '+')
+        self.assertEqual(c.closed_min, False)
+        self.assertEqual(c.closed_max, False)
+        self.assertEqual(Constraint.from_codes(c.min_code, c.max_code).show(), "(3,+)")
+        self.assertEqual(Constraint.from_codes(c.min_code, c.max_code), c)
+        self.assertTrue(upper_code('3', False) < lower_code('3', True) < upper_code('3', True) < lower_code('3', False))
+
+    def testBracketNum(self):
+        self.assertTrue(BracketNum('6', Bracket.LC) < BracketNum('6', Bracket.LO))
+        self.assertTrue(BracketNum('6', Bracket.RO) < BracketNum('6', Bracket.LC))
+        self.assertTrue(BracketNum('+', Bracket.RO) > BracketNum('7', Bracket.LC))
+        self.assertEqual(BracketNum('0', Bracket.LC).complement(), BracketNum('0', Bracket.LC))
+        self.assertEqual(BracketNum('2', Bracket.LO).complement(), BracketNum('2', Bracket.RC))
+        self.assertEqual(BracketNum('+', Bracket.RO).complement(), BracketNum('+', Bracket.RO))
+
+    def testIsininterval(self):
+        c = Constraint("(3,+)")
+        self.assertEqual(c.isininterval(3), False)
+        self.assertEqual(c.isininterval(3.1), True)
+        self.assertEqual(c.isininterval(1000), True)
+        c = Constraint("[1,2]")
+        self.assertEqual(c.isininterval(1), True)
+        self.assertEqual(c.isininterval(2), True)
+        self.assertEqual(c.isininterval(2.1), False)
+        self.assertEqual(Constraint("[2,2]").isPoint(), True)
+        self.assertEqual(Constraint("[2,3)").isPoint(), False)
+        self.assertEqual(Constraint("(0,0)").isEmpty(), True)
+
+    def testIntersectUnion(self):
+        c, flag = intersect_constraint(Constraint("[0,3)"), Constraint("(1,5]"))
+        self.assertEqual((c.show(), flag), ("(1,3)", True))
+        c, flag = intersect_constraint(Constraint("[0,3)"), Constraint("[3,5]"))
+        self.assertEqual(flag, False)
+        c, num = union_constraint(Constraint("[0,3)"), Constraint("[3,5]"))
+        self.assertEqual((c.show(), num), ("[0,5]", 1))
+        cs, num = union_constraint(Constraint("(3,5]"), Constraint("[0,3)"))
+        self.assertEqual(([c.show() for c in cs], num), (["[0,3)", "(3,5]"], 2))
+
+    def testComplement(self):
+        cs, flag = Constraint("(2,3]").complement()
+        self.assertEqual(([c.show() for c in cs], flag), (["[0,2]", "(3,+)"], True))
+        cs = complement_intervals([Constraint("[1,3)"), Constraint("[4,5]")])
+        self.assertEqual([c.show() for c in cs], ["[0,1)", "[3,4)", "(5,+)"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -79,12 +79,46 @@ class EquivalenceTest(unittest.TestCase):
         self.assertEqual(AA.initstate_name,'1')
         self.assertEqual(AA.accept_names,['3'])
     
+    def testFindTran(self):
+        self.assertEqual(AA.find_tran("1", 'a', 1).id, 0)
+        self.assertEqual(AA.find_tran("1", 'a', 2.5).id, 0)
+        self.assertEqual(AA.find_tran("1", 'a', 3).id, 4)
+        self.assertEqual(AA.find_tran("1", 'a', 0.1).id, 3)
+        self.assertEqual(AA.find_tran("3", 'a', 2).id, 2)
+        self.assertEqual(AA.find_tran("3", 'a', 2.1).id, 10)
+        self.assertEqual(AA.find_tran("2", 'b', 3, True).id, 1)
+        self.assertEqual(AA.find_tran("2", 'b', 3, False), None)
+        self.assertEqual(A.find_tran("1", 'a', 3), None)
+        self.assertEqual(A.find_tran("1", 'b', 0), None)
+
+    def testMembershipTrie(self):
+        A, _ = buildOTA('a.json', 's')
+        AA = buildAssistantOTA(A, 's')
+        trie = AA.membership_trie()
+        self.assertIs(AA.membership_trie(), trie)
+        node = trie.query([Timedword('a',1), Timedword('b',3)])
+        self.assertEqual((node.location, node.clock, node.reset), ("3", 0, True))
+        self.assertEqual(trie.value(node), 1)
+        self.assertEqual((trie.hits, trie.misses, trie.steps), (0, 1, 2))
+        node = trie.query([ResetTimedword('a',1,False)])
+        self.assertEqual((node.location, node.clock, node.reset), ("2", 1, False))
+        self.assertEqual((trie.hits, trie.misses, trie.steps), (1, 1, 2))
+        node = trie.query([Timedword('b',0)], node)
+        self.assertEqual((node.location, trie.value(node)), ("4", -1))
+        self.assertEqual((trie.hits, trie.misses, trie.steps), (1, 2, 3))
+        self.assertEqual(trie.run([ResetTimedword('a',1,False), ResetTimedword('a',2,True)]).location, AA.run_resettimedwords([ResetTimedword('a',1,False), ResetTimedword('a',2,True)]))
+
     def testResetTimedword(self):
         tw1 = Timedword('a',2)
         rtw1 = ResetTimedword('b',3.1,True)
         self.assertEqual(tw1.show(), "(a,2)")
         self.assertEqual(rtw1.show(), "(b,3.1,R)")
         #print(rtw1)
+        self.assertEqual(ResetTimedword('b',3.1,True), rtw1)
+        self.assertNotEqual(ResetTimedword('b',3.1,False), rtw1)
+        self.assertEqual(len(set([rtw1, ResetTimedword('b',3.1,True), ResetTimedword('b',3,True)])), 2)
+        with self.assertRaises(AttributeError):
+            rtw1.time = 3
 
     def testcase1(self):
         ota1, _ = buildOTA('test.json', 's')
@@ -7,6 +7,7 @@ from ota import *
 from otatable import *
 from equivalence import *
 from hypothesis import *
+from fa import FA, FAState, FATran
 from learnota import init_table
 
 A, _ = buildOTA('example.json', 's')
@@ -62,6 +63,62 @@ class EquivalenceTest(unittest.TestCase):
         self.assertEqual(new_R, [e1,e2])
         self.assertEqual(move,[ctx1])
 
+    def testOTATable_isconsistent(self):
+        e0 = Element(rtws0,[0])
+        e1 = Element(rtws1,[0])
+        e2 = Element(rtws2,[0])
+        e3 = Element(rtws3,[1])
+        T1 = OTATable([e0],[e1,e2,e3],[])
+        self.assertEqual(T1.is_consistent(), (True, None, None))
+        self.assertEqual(T1.rows_index()[(0,)], [e0,e1,e2])
+        self.assertEqual(T1.children_index()[()], [e1,e2,e3])
+
+        e5 = Element([rtw1,rtw1],[1])
+        T2 = OTATable([e0],[e1,e2,e3,e5],[])
+        flag, new_a, new_e_index = T2.is_consistent()
+        self.assertEqual(flag, False)
+        self.assertEqual(new_a, [rtw1])
+        self.assertEqual(new_e_index, 0)
+        self.assertEqual(T1.inconsistencies(), [])
+        self.assertEqual(T2.inconsistencies(), [([rtw1], 0)])
+        self.assertEqual(Defects([e0],[e1],[],[],[]).prepared(), True)
+        self.assertEqual(Defects([e0],[e1],[],[([rtw1], 0)],[]).prepared(), False)
+
+    def testFillEndNode(self):
+        A, _ = buildOTA('a.json', 's')
+        AA = buildAssistantOTA(A, 's')
+        trie = AA.membership_trie()
+        e = Element([ResetTimedword('a',1,False)],[])
+        fill(e, [], AA)
+        self.assertEqual(e.value, [0])
+        node = e.end_node(trie)
+        self.assertEqual((node.location, node.clock, node.reset), ("2", 1, False))
+        steps = trie.steps
+        fill(e, [[Timedword('b',3)], [Timedword('b',0)]], AA)
+        self.assertEqual(e.value, [0, 1, -1])
+        self.assertEqual(trie.steps, steps + 2)
+        self.assertIs(e.end_node(trie), node)
+        e_copy = copy.deepcopy(e)
+        self.assertEqual(e_copy, e)
+        self.assertIs(e_copy.end_node(trie), node)
+
+    def testColumnTrie(self):
+        A, _ = buildOTA('a.json', 's')
+        AA = buildAssistantOTA(A, 's')
+        E = [[Timedword('b',3)], [Timedword('b',3),Timedword('a',1)], [Timedword('b',0)], [Timedword('a',2)], [Timedword('b',3),Timedword('a',1),Timedword('b',2)]]
+        columns = ColumnTrie(E)
+        self.assertEqual(len(columns.root.children), 3)
+        for tws in [[], [ResetTimedword('a',1,False)], [ResetTimedword('a',1,False),ResetTimedword('b',3,True)]]:
+            e1 = Element(tws, [])
+            e2 = Element(tws, [])
+            fill(e1, E, AA)
+            fill(e2, E, AA, columns)
+            self.assertEqual(e1.value, e2.value)
+        e3 = Element([ResetTimedword('a',1,False)], [])
+        fill(e3, E[:2], AA, ColumnTrie(E[:2]))
+        fill(e3, E, AA, columns)
+        self.assertEqual(e3.value, [0, 1, 0, -1, -1, 1])
+
     def testMakeclosed(self):
         e0 = Element(rtws0,[0])
         e1 = Element(rtws1,[0])
@@ -83,6 +140,95 @@ class EquivalenceTest(unittest.TestCase):
         T3 = make_closed(new_S, new_R, move, T2, AA.sigma, AA)
         #T3.show()
 
+    def testTimepointGuard(self):
+        self.assertEqual(timepoint_guard(1, 3), Constraint("[1,3)"))
+        self.assertEqual(timepoint_guard(1, 2.1), Constraint("[1,2]"))
+        self.assertEqual(timepoint_guard(1.1, 3), Constraint("(1,3)"))
+        self.assertEqual(timepoint_guard(2.1, None).show(), "(2,+)")
+        fa = FA("FA", [], [FAState("1", True, False), FAState("2", False, True)],
+                [FATran(0, "1", "2", [ResetTimedword('a',3,False), ResetTimedword('a',0,False)]),
+                 FATran(1, "1", "1", [ResetTimedword('a',3,True)]), FATran(2, "1", "1", [ResetTimedword('b',1,True)])], "1", ["2"])
+        H = fa_to_ota(fa, "", ['a','b'], 1)
+        # the time point 3 of a is in two labels, both get the guard [3,+)
+        self.assertEqual([(t.source, t.label, t.constraints[0].show(), t.reset, t.target) for t in H.trans],
+                         [("1", 'a', "[3,+)", False, "2"), ("1", 'a', "[0,3)", False, "2"),
+                          ("1", 'a', "[3,+)", True, "1"), ("1", 'b', "[1,+)", True, "1")])
+
+    def testHypothesisBuilder(self):
+        T1 = init_table(AA.sigma, AA)
+        flag_closed, new_S, new_R, move = T1.is_closed()
+        T2 = make_closed(new_S, new_R, move, T1, AA.sigma, AA)
+        builder = HypothesisBuilder(AA.sigma)
+        H1 = builder.build(T2, 1)
+        FA1, sink = to_fa(T2, 1)
+        H = minimize_locations(combine_transitions(fa_to_ota(FA1, sink, AA.sigma, 1)))
+        self.assertEqual(H1.changed, set([l.name for l in H.locations]))
+        self.assertEqual([(t.id, t.source, t.label, t.constraints[0], t.reset, t.target) for t in H1.trans],
+                         [(t.id, t.source, t.label, t.constraints[0], t.reset, t.target) for t in H.trans])
+        equivalence_query(max_time_value, AA, H1)
+        H1_trans = [(t.id, t.source, t.label, t.constraints[0], t.reset, t.target) for t in H1.trans]
+        H2 = builder.build(T2, 2)
+        self.assertEqual([(t.id, t.source, t.label, t.constraints[0], t.reset, t.target) for t in H1.trans], H1_trans)
+        self.assertEqual(H2.changed, set())
+        self.assertIs(H2.locations[0], H1.locations[0])
+        self.assertIs(H2.base_table, H1.succ_table)
+        table = successor_table(H2, H1.succ_table.regions)
+        self.assertEqual(table.succ, H1.succ_table.succ)
+        self.assertEqual(H2.base_table, None)
+        # Building a hypothesis does not change the transitions of the previous ones.
+        builder = HypothesisBuilder(AA.sigma)
+        table = T1
+        hypotheses = []
+        trans_ids = []
+        equivalent = False
+        while equivalent == False:
+            defects = table.analyze(AA)
+            while defects.prepared() == False:
+                table = make_prepared(defects, table, AA.sigma, AA)
+                defects = table.analyze(AA)
+            hypotheses.append(builder.build(table, len(hypotheses)))
+            trans_ids.append([(t.id, t.source, t.target) for t in hypotheses[-1].trans])
+            equivalent, ctx = equivalence_query(max_time_value, AA, hypotheses[-1])
+            if equivalent == False:
+                table = add_ctx(ctx.tws, table, AA)
+        for H, ids in zip(hypotheses, trans_ids):
+            self.assertEqual([(t.id, t.source, t.target) for t in H.trans], ids)
+
+    def testMinimizeLocations(self):
+        locations = [Location("s", True, False, 'q'), Location("p", False, True, 'q'), Location("q", False, True, 'q'), Location("t", False, False, 'q', True)]
+        trans = [OTATran(0, "s", "a", [Constraint("[0,1)")], False, "p", 'q'),
+                 OTATran(1, "s", "a", [Constraint("[1,+)")], True, "q", 'q'),
+                 OTATran(2, "p", "a", [Constraint("[0,2]")], True, "p", 'q'),
+                 OTATran(3, "p", "a", [Constraint("(2,+)")], True, "q", 'q'),
+                 OTATran(4, "q", "a", [Constraint("[0,+)")], True, "q", 'q')]
+        trans += [OTATran(5 + i, name, "b", [Constraint("[0,+)")], True, "t", 'q') for i, name in enumerate(["s", "p", "q", "t"])]
+        H = OTA("H", ["a", "b"], locations, trans, "s", ["p", "q"])
+        H.sink_name = "t"
+        M = minimize_locations(H)
+        self.assertEqual([l.name for l in M.locations], ["s", "p", "t"])
+        self.assertEqual(M.accept_names, ["p"])
+        self.assertEqual([(t.source, t.label, t.constraints[0].show(), t.reset, t.target) for t in M.trans],
+                         [("s", "a", "[0,1)", False, "p"), ("s", "a", "[1,+)", True, "p"), ("s", "b", "[0,+)", True, "t"),
+                          ("p", "a", "[0,+)", True, "p"), ("p", "b", "[0,+)", True, "t"), ("t", "b", "[0,+)", True, "t")])
+        self.assertIs(minimize_locations(M), M)
+        R = remove_sinklocation(M)
+        self.assertEqual([(l.name, l.init, l.accept) for l in R.locations], [("1", True, False), ("2", False, True)])
+        self.assertEqual([(t.id, t.source, t.target) for t in R.trans], [(0, "1", "2"), (1, "1", "2"), (2, "2", "2")])
+        self.assertEqual([l.name for l in M.locations], ["s", "p", "t"])
+        # A hypothesis which accepts nothing: the initial location is in the class of the sink.
+        locations = [Location("s", True, False, 'q'), Location("t", False, False, 'q', True)]
+        trans = [OTATran(0, "s", "a", [Constraint("[0,+)")], True, "t", 'q'), OTATran(1, "t", "a", [Constraint("[0,+)")], True, "t", 'q')]
+        H = OTA("H", ["a"], locations, trans, "s", [])
+        H.sink_name = "t"
+        M = minimize_locations(H)
+        self.assertEqual([l.name for l in M.locations], ["s"])
+        self.assertEqual(M.sink_name, "")
+        R = remove_sinklocation(M)
+        self.assertEqual([(t.source, t.constraints[0].show(), t.target) for t in R.trans], [("1", "[0,+)", "1")])
+        trans.append(OTATran(2, "s", "a", [Constraint("[1,2]")], False, "s", 'q'))
+        H = OTA("H", ["a"], locations, trans, "s", [])
+        self.assertIs(minimize_locations(H), H)
+
     # def testToFA(self):
     #     e0 = Element(rtws0,[0])
     #     e1 = Element(rtws1,[0])
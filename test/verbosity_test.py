@@ -0,0 +1,34 @@
+#Unit tests for verbosity.py
+
+import unittest
+import sys
+import io
+import contextlib
+sys.path.append('../')
+import verbosity
+from verbosity import *
+
+class Unformattable(object):
+    def __str__(self):
+        raise AssertionError("formatted a message which is not printed")
+
+class VerbosityTest(unittest.TestCase):
+    def tearDown(self):
+        verbosity.set_level(TABLE)
+
+    def testSetLevel(self):
+        self.assertEqual(verbosity.set_level("silent"), SILENT)
+        self.assertEqual(verbosity.set_level("2"), ROUND)
+        self.assertEqual(verbosity.enabled(SUMMARY), True)
+        self.assertEqual(verbosity.enabled(TABLE), False)
+
+    def testLog(self):
+        verbosity.set_level("summary")
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            log(SUMMARY, "Total number of equivalence query: %s", 3)
+            log(ROUND, "Table %s", Unformattable())
+        self.assertEqual(out.getvalue(), "Total number of equivalence query: 3\n")
+
+if __name__ == "__main__":
+    unittest.main()
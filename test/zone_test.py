@@ -0,0 +1,39 @@
+#Unit tests for zone.py
+
+import unittest
+import sys
+from fractions import Fraction
+sys.path.append('../')
+from interval import Constraint
+from zone import *
+
+class ZoneTest(unittest.TestCase):
+    def testConstrain(self):
+        d = up(zero())
+        self.assertEqual(constrain(d, 1, Constraint("[1,3)")), (1, -1, -1, 6, 1, 1, 6, 1, 1))
+        self.assertEqual(constrain(constrain(d, 1, Constraint("[1,3)")), 2, Constraint("[3,+)")), None)
+        self.assertEqual(constrain(d, 2, Constraint("(2,+)")), (1, -4, -4, INF, 1, 1, INF, 1, 1))
+
+    def testResetAndFree(self):
+        d = constrain(up(zero()), 1, Constraint("[1,3)"))
+        r = reset(d, 2)
+        self.assertEqual(r, (1, -1, 1, 6, 1, 6, 1, -1, 1))
+        self.assertEqual(includes(free(r, 2), d), True)
+        self.assertEqual(includes(d, free(r, 2)), False)
+        self.assertEqual(includes(up(r), r), True)
+
+    def testExtrapolate(self):
+        d1 = constrain(up(zero()), 1, Constraint("(5,+)"))
+        d2 = constrain(up(zero()), 1, Constraint("(7,+)"))
+        self.assertNotEqual(d1, d2)
+        self.assertEqual(extrapolate(d1, 4, 4), extrapolate(d2, 4, 4))
+        self.assertEqual(includes(extrapolate(d1, 4, 4), d1), True)
+
+    def testDelayInterval(self):
+        d = constrain(constrain(up(zero()), 1, Constraint("(1,3]")), 2, Constraint("[0,2)"))
+        self.assertEqual(delay_interval(d, (Fraction(0), Fraction(0))), (1, False, 2, False))
+        self.assertEqual(pick(*delay_interval(d, (Fraction(0), Fraction(0)))), Fraction(3, 2))
+        self.assertEqual(pick(*delay_interval(d, (Fraction(1, 2), Fraction(1, 2)))), Fraction(1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+#Verbosity levels of the learners
+
+SILENT = 0   # only errors
+SUMMARY = 1  # the learned OTA and the statistics
+ROUND = 2    # one line for each table
+TABLE = 3    # full dumps of each table
+
+LEVELS = {"silent": SILENT, "summary": SUMMARY, "round": ROUND, "table": TABLE}
+
+level = TABLE
+
+def set_level(arg):
+    """Set the verbosity level from a number or a name in LEVELS.
+    """
+    global level
+    if arg in LEVELS:
+        level = LEVELS[arg]
+    else:
+        level = int(arg)
+    return level
+
+def enabled(l):
+    return l <= level
+
+def log(l, msg, *args):
+    """Print msg % args if the level l is enabled. The message is only formatted when it is printed.
+    """
+    if l <= level:
+        if len(args) > 0:
+            msg = msg % args
+        print(msg)
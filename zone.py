@@ -0,0 +1,146 @@
+#zones as difference bound matrices (DBMs) of the two clocks of a product of OTAs
+
+from fractions import Fraction
+from interval import INFCODE
+
+# The clocks are numbered 0 for the constant 0, 1 for the clock x of the first OTA and
+# 2 for the clock y of the second one. A DBM is the tuple of the 9 bounds of x_i - x_j,
+# stored at 3*i+j. A bound (c,<) is encoded as the integer 2c and a bound (c,<=) as 2c+1,
+# so that the tighter bound is the smaller integer. INF for no bound.
+INF = 1 << 62
+LE0 = 1
+
+def bound(c, closed):
+    if closed == True:
+        return 2*c + 1
+    else:
+        return 2*c
+
+def add(b1, b2):
+    if b1 == INF or b2 == INF:
+        return INF
+    return 2*((b1 >> 1) + (b2 >> 1)) + (b1 & b2 & 1)
+
+def canonical(d):
+    """Tighten all the bounds of the DBM d (a list). Return the DBM as a tuple, or None if it is empty.
+    """
+    for k in range(3):
+        for i in range(3):
+            dik = d[3*i+k]
+            if dik == INF:
+                continue
+            for j in range(3):
+                b = add(dik, d[3*k+j])
+                if b < d[3*i+j]:
+                    d[3*i+j] = b
+    if d[0] < LE0 or d[4] < LE0 or d[8] < LE0:
+        return None
+    return tuple(d)
+
+def zero():
+    """The DBM of x = y = 0.
+    """
+    return tuple([LE0]*9)
+
+def up(d):
+    """The DBM of the valuations reached from d by letting time elapse.
+    """
+    d = list(d)
+    d[3] = INF
+    d[6] = INF
+    return tuple(d)
+
+def down(d):
+    """The DBM of the valuations from which d can be reached by letting time elapse.
+    """
+    d = list(d)
+    d[1] = LE0
+    d[2] = LE0
+    return canonical(d)
+
+def constrain(d, clock, constraint):
+    """Intersect the DBM d with the guard constraint on the clock. Return None if it is empty.
+    """
+    d = list(d)
+    lower = bound(-(constraint.min_code >> 2), (constraint.min_code & 3) == 1)
+    if lower < d[clock]:
+        d[clock] = lower
+    if constraint.max_code != INFCODE:
+        upper = bound(constraint.max_code >> 2, (constraint.max_code & 3) == 2)
+        if upper < d[3*clock]:
+            d[3*clock] = upper
+    return canonical(d)
+
+def intersect(d1, d2):
+    return canonical([min(b1, b2) for b1, b2 in zip(d1, d2)])
+
+def reset(d, clock):
+    """The DBM d after resetting the clock to 0.
+    """
+    d = list(d)
+    for j in range(3):
+        d[3*clock+j] = d[j]
+        d[3*j+clock] = d[3*j]
+    d[4*clock] = LE0
+    return tuple(d)
+
+def free(d, clock):
+    """The DBM of the valuations which are in d after resetting the clock to 0.
+    """
+    d = list(d)
+    for j in range(3):
+        d[3*clock+j] = INF
+        d[3*j+clock] = d[3*j]
+    d[4*clock] = LE0
+    return tuple(d)
+
+def includes(d1, d2):
+    """Whether the DBM d2 is a subset of the DBM d1.
+    """
+    return all(b2 <= b1 for b1, b2 in zip(d1, d2))
+
+def extrapolate(d, max_x, max_y):
+    """Abstract the DBM d by the max constants of the clocks (Extra_M), keeping the
+       locations which can be reached the same.
+    """
+    m = (0, max_x, max_y)
+    d = list(d)
+    for i in range(3):
+        for j in range(3):
+            b = d[3*i+j]
+            if i == j or b == INF:
+                continue
+            if b > bound(m[i], True):
+                d[3*i+j] = INF
+            elif b < bound(-m[j], False):
+                d[3*i+j] = bound(-m[j], False)
+    return canonical(d)
+
+def delay_interval(d, v):
+    """For a valuation v = (value of x, value of y) of the DBM down(d), return the delays t
+       such that v+t is in d, as (lo, lo closed, hi, hi closed), hi None for no bound.
+    """
+    lo, lo_closed = Fraction(0), True
+    hi, hi_closed = None, True
+    for clock in (1, 2):
+        value = v[clock-1]
+        b = d[clock]
+        c = Fraction(-(b >> 1)) - value
+        if c > lo or (c == lo and (b & 1) == 0):
+            lo, lo_closed = c, (b & 1) == 1
+        b = d[3*clock]
+        if b != INF:
+            c = Fraction(b >> 1) - value
+            if hi is None or c < hi or (c == hi and (b & 1) == 0):
+                hi, hi_closed = c, (b & 1) == 1
+    return lo, lo_closed, hi, hi_closed
+
+def pick(lo, lo_closed, hi, hi_closed):
+    """Pick a number of the interval: the smallest integer in it, if any, otherwise the middle.
+    """
+    n = lo.numerator // lo.denominator
+    if n < lo or (n == lo and lo_closed == False):
+        n = n + 1
+    if hi is None or n < hi or (n == hi and hi_closed == True):
+        return Fraction(n)
+    return (lo + hi) / 2